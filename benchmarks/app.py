@@ -0,0 +1,46 @@
+import csv
+import io
+import logging
+import os
+import tempfile
+import zipfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from benchmarks.common import ROOT
+
+
+def prepare_database() -> str:
+    # отдельная временная БД SQLite, схема создаётся миграциями; вызывать до импорта src
+    from alembic import command
+    from alembic.config import Config
+
+    directory = tempfile.mkdtemp(prefix='dining_room_bench_')
+    os.environ['DSN'] = f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}"
+    config = Config(os.path.join(ROOT, 'alembic.ini'))
+    config.set_main_option('script_location', os.path.join(ROOT, 'migrations'))
+    config.set_main_option('sqlalchemy.url', os.environ['DSN'])
+    command.upgrade(config, 'head')
+    return directory
+
+
+@asynccontextmanager
+async def app_client() -> AsyncIterator['httpx.AsyncClient']:
+    import httpx
+
+    from src.main import app
+
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=60) as client:
+            yield client
+
+
+async def issue_tickets(client: 'httpx.AsyncClient', count: int) -> list[str]:
+    response = await client.post('/api/v1/tickets/bulk', params={'format': 'png1'},
+                                 json={'names': [f'bench {number}' for number in range(count)]})
+    response.raise_for_status()
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        rows = csv.DictReader(io.StringIO(archive.read('tickets.csv').decode()))
+        return [row['ticket_uuid'] for row in rows]
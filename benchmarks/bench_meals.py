@@ -0,0 +1,100 @@
+"""Сквозной бенчмарк отметки о приёме пищи на временной БД SQLite.
+
+    python -m benchmarks.bench_meals [--scans N] [--concurrency C] [--size vga|2mp|5mp|12mp] [--batching]
+                                     [--readers N] [--read-interval S] [--read-pool]
+
+Каждый купон сканируется один раз, т.е. измеряется путь успешной отметки:
+распознавание, проверка лимита и запись. --batching включает пакетную запись отметок
+(MEAL_WRITE_BATCHING), чтобы сравнить пропускную способность с записью по одной.
+--readers N параллельно с отметками по uuid запускает N клиентов, каждый из которых раз в S секунд
+читает GET /meals и отчёт за месяц (нагрузка чтения постоянна и не зависит от скорости ответов);
+--read-pool отправляет эти чтения в отдельный пул соединений только для чтения (SQLITE_READ_POOL).
+"""
+import asyncio
+import os
+import time
+
+from benchmarks.app import app_client, issue_tickets, prepare_database
+from benchmarks.common import make_parser, report, summarize
+
+
+async def run_requests(requests, concurrency: int) -> tuple[list[float], float, dict[int, int]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: list[float] = []
+    statuses: dict[int, int] = {}
+
+    async def run(request) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            response = await request()
+            samples.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(request) for request in requests))
+    return samples, time.perf_counter() - start, statuses
+
+
+async def read_loop(client, stop: asyncio.Event, interval: float, samples: list[float]) -> None:
+    requests = (
+        lambda: client.get('/api/v1/meals', params={'limit': 1000}),
+        lambda: client.get('/api/v1/reports/users', params={'month': time.strftime('%Y-%m')}),
+    )
+    while not stop.is_set():
+        for request in requests:
+            start = time.perf_counter()
+            (await request()).raise_for_status()
+            samples.append(time.perf_counter() - start)
+            await asyncio.sleep(max(interval - samples[-1], 0))
+
+
+async def bench(scans: int, concurrency: int, size: str, readers: int, read_interval: float) -> list[dict]:
+    from benchmarks.corpus import PHOTO_SIZES, make_photo
+
+    results = []
+    async with app_client() as client:
+        tickets = await issue_tickets(client, scans * 2)
+        photos = [make_photo(ticket, PHOTO_SIZES[size], seed) for seed, ticket in enumerate(tickets[:scans])]
+
+        requests = [
+            lambda photo=photo: client.post('/api/v1/meals', files={'file': ('scan.jpg', photo, 'image/jpeg')})
+            for photo in photos
+        ]
+        samples, elapsed, statuses = await run_requests(requests, concurrency)
+        results.append(summarize(f'POST /meals [{size}]', samples, elapsed, statuses=statuses))
+
+        requests = [
+            lambda ticket=ticket: client.post('/api/v1/meals/checkin', json={'uuid': ticket})
+            for ticket in tickets[scans:]
+        ]
+        stop, read_samples = asyncio.Event(), []
+        read_tasks = [asyncio.create_task(read_loop(client, stop, read_interval, read_samples)) for _ in range(readers)]
+        samples, elapsed, statuses = await run_requests(requests, concurrency)
+        stop.set()
+        await asyncio.gather(*read_tasks)
+        results.append(summarize('POST /meals/checkin', samples, elapsed, statuses=statuses, readers=readers))
+        if read_samples:
+            results.append(summarize('GET /meals + /reports/users', read_samples, elapsed))
+    return results
+
+
+def main() -> None:
+    parser = make_parser(__doc__)
+    parser.add_argument('--scans', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--size', default='vga')
+    parser.add_argument('--batching', action='store_true')
+    parser.add_argument('--readers', type=int, default=0)
+    parser.add_argument('--read-interval', type=float, default=0.1)
+    parser.add_argument('--read-pool', action='store_true')
+    args = parser.parse_args()
+    # конфигурация читается при импорте src, поэтому переменные ставятся до него
+    os.environ['MEAL_WRITE_BATCHING'] = '1' if args.batching else '0'
+    os.environ['SQLITE_READ_POOL'] = '1' if args.read_pool else '0'
+    prepare_database()
+    results = asyncio.run(bench(args.scans, args.concurrency, args.size, args.readers, args.read_interval))
+    report('meals', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Микробенчмарки генерации и распознавания QR-кодов.
+
+    python -m benchmarks.bench_qr [--repeat N] [--output bench_output.txt]
+"""
+import io
+import time
+
+from benchmarks.common import make_parser, measure, report, summarize
+from benchmarks.corpus import PHOTO_SIZES, make_corpus
+from src.services.qr import decode, get_image, render
+
+DATA = '513a2fc7-8d96-4514-bffd-228eefcafc0c'
+
+
+def bench_render(repeat: int) -> list[dict]:
+    def pil_png() -> None:
+        get_image(DATA).save(io.BytesIO(), 'png')
+
+    results = [summarize('get_image+png', measure(pil_png, repeat))]
+    for fmt in ('png', 'png1', 'svg'):
+        results.append(summarize(f'render[{fmt}]', measure(lambda: render(DATA, fmt), repeat),
+                                 bytes=len(render(DATA, fmt))))
+    return results
+
+
+def bench_decode(repeat: int) -> list[dict]:
+    results = []
+    for name, items in make_corpus().items():
+        samples, paths = [], {}
+        for _ in range(repeat):
+            for data, photo in items:
+                start = time.perf_counter()
+                result = decode(photo)
+                samples.append(time.perf_counter() - start)
+                path = result.path if result.data == data else 'miss'
+                paths[path] = paths.get(path, 0) + 1
+        width, height = PHOTO_SIZES[name]
+        results.append(summarize(f'decode[{name}]', samples, resolution=f'{width}x{height}',
+                                 bytes=sum(len(photo) for _, photo in items) // len(items), paths=paths))
+    return results
+
+
+def main() -> None:
+    parser = make_parser(__doc__)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    report('qr', bench_render(args.repeat) + bench_decode(max(args.repeat // 10, 1)), args.output)
+
+
+if __name__ == '__main__':
+    main()
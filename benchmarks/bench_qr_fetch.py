@@ -0,0 +1,63 @@
+"""Задержка первого и повторного POST /qr после выпуска купона.
+
+    python -m benchmarks.bench_qr_fetch [--tickets N] [--delay S] [--prerender]
+
+Для каждого купона: POST /users, POST /tickets, пауза S секунд (клиент открывает страницу купона),
+затем POST /qr дважды. Без --prerender первый запрос рисует код сам, с --prerender (QR_PRERENDER)
+код рисуется фоновой очередью после выпуска и первый запрос должен стоить как попадание в кэш.
+"""
+import asyncio
+import os
+import re
+import time
+
+from benchmarks.app import app_client, prepare_database
+from benchmarks.common import make_parser, report, summarize
+
+
+async def fetch(client, ticket_uuid: str) -> float:
+    start = time.perf_counter()
+    response = await client.post('/api/v1/qr', json={'uuid': ticket_uuid})
+    elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    return elapsed
+
+
+def metric_mean(text: str, name: str) -> float:
+    total = re.search(rf'^{name}_sum (\S+)$', text, re.MULTILINE)
+    count = re.search(rf'^{name}_count (\S+)$', text, re.MULTILINE)
+    if not total or not count or not float(count.group(1)):
+        return 0.0
+    return round(float(total.group(1)) / float(count.group(1)) * 1000, 3)
+
+
+async def bench(tickets: int, delay: float) -> list[dict]:
+    first, cached = [], []
+    async with app_client() as client:
+        for number in range(tickets):
+            user = (await client.post('/api/v1/users', json={'name': f'bench {number}'})).json()
+            ticket = (await client.post('/api/v1/tickets', json={'uuid': user['uuid']})).json()
+            await asyncio.sleep(delay)
+            first.append(await fetch(client, ticket['uuid']))
+            cached.append(await fetch(client, ticket['uuid']))
+        metrics = (await client.get('/metrics')).text
+    return [
+        summarize('POST /qr first', first, prerender_lag_ms=metric_mean(metrics, 'qr_prerender_lag_seconds')),
+        summarize('POST /qr cached', cached),
+    ]
+
+
+def main() -> None:
+    parser = make_parser(__doc__)
+    parser.add_argument('--tickets', type=int, default=200)
+    parser.add_argument('--delay', type=float, default=0.05)
+    parser.add_argument('--prerender', action='store_true')
+    args = parser.parse_args()
+    # конфигурация читается при импорте src, поэтому переменная ставится до него
+    os.environ['QR_PRERENDER'] = '1' if args.prerender else '0'
+    prepare_database()
+    report('qr_fetch', asyncio.run(bench(args.tickets, args.delay)), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Стоимость сериализации списка купонов в расчёте на строку.
+
+    python -m benchmarks.bench_serialize [--rows N] [--repeat N]
+
+pydantic - прежний путь: проверка через response_model=list[TicketOut] и сериализация
+pydantic в JSON-совместимые объекты перед orjson (как делает FastAPI);
+asdict - Row._asdict() и orjson без проверки; dump_rows - текущий путь (dict(zip) с заранее
+посчитанными ключами и orjson). GET /tickets - запрос целиком через ASGI, включая чтение из БД.
+"""
+import asyncio
+import time
+
+import orjson
+from pydantic import TypeAdapter
+
+from benchmarks.app import app_client, issue_tickets, prepare_database
+from benchmarks.common import make_parser, measure, report, summarize
+
+
+def per_row(result: dict, rows: int) -> dict:
+    result['us_per_row'] = round(result['mean_ms'] * 1000 / rows, 3)
+    return result
+
+
+async def bench(rows: int, repeat: int) -> list[dict]:
+    from sqlalchemy import select
+
+    from src.api.v1.schemas import TicketOut
+    from src.db.database import async_session
+    from src.models.users import Ticket
+    from src.services.base import LIST_COLUMNS, LIST_KEYS
+    from src.services.utils import dump_rows
+
+    async with app_client() as client:
+        await issue_tickets(client, rows)
+        async with async_session() as session:
+            items = (await session.execute(select(*LIST_COLUMNS[Ticket]).limit(rows))).all()
+        adapter = TypeAdapter(list[TicketOut])
+        keys = LIST_KEYS[Ticket]
+
+        def pydantic_path() -> bytes:
+            validated = adapter.validate_python([row._asdict() for row in items])
+            return orjson.dumps(adapter.dump_python(validated, mode='json'))
+
+        results = [
+            per_row(summarize('pydantic', measure(pydantic_path, repeat)), rows),
+            per_row(summarize('asdict', measure(lambda: orjson.dumps([row._asdict() for row in items]), repeat)),
+                    rows),
+            per_row(summarize('dump_rows', measure(lambda: dump_rows(keys, items), repeat)), rows),
+        ]
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = await client.get('/api/v1/tickets', params={'limit': rows})
+            samples.append(time.perf_counter() - start)
+            response.raise_for_status()
+        results.append(per_row(summarize('GET /tickets', samples), rows))
+    return results
+
+
+def main() -> None:
+    parser = make_parser(__doc__)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    prepare_database()
+    results = asyncio.run(bench(args.rows, args.repeat))
+    report('serialize', results, args.output)
+    for result in results:
+        print(f"{result['name']}: {result['us_per_row']} мкс на строку")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Время старта и память воркеров uvicorn (только Linux: память читается из /proc).
+
+    python -m benchmarks.bench_startup [--workers 1,2,4] [--repeat N]
+
+import src.main - холодный импорт приложения без OpenCV/numpy/qrcode/PIL,
+import src.main + imaging - то же вместе с ними (так стартовало приложение до ленивого импорта),
+startup workers=N - от запуска python -m src.main до первого ответа /metrics, включая прогрев
+пула соединений и декодера. Память (RSS) - на воркер uvicorn и суммарно с процессами пулов.
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.app import prepare_database
+from benchmarks.common import ROOT, make_parser, report, summarize
+
+STARTUP_TIMEOUT = 60
+
+
+def time_command(code: str, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def children(pid: int) -> list[int]:
+    result = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as file:
+                # поле ppid идёт после имени процесса в скобках, которое может содержать пробелы
+                ppid = int(file.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            result.append(int(entry))
+    return result
+
+
+def rss_mb(pid: int) -> float:
+    with open(f'/proc/{pid}/status') as file:
+        for line in file:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def cmdline(pid: int) -> str:
+    with open(f'/proc/{pid}/cmdline', 'rb') as file:
+        return file.read().replace(b'\0', b' ').decode(errors='replace')
+
+
+def measure_memory(root: int, workers: int) -> dict[str, float]:
+    # при одном воркере сервер работает в корневом процессе, иначе корневой процесс - супервизор
+    worker_pids = [root] if workers == 1 else [pid for pid in children(root) if 'spawn_main' in cmdline(pid)]
+    pool_pids = [child for pid in worker_pids for child in children(pid)]
+    worker_rss = [rss_mb(pid) for pid in worker_pids]
+    return {
+        'rss_worker_mb': round(sum(worker_rss) / max(len(worker_rss), 1), 1),
+        'rss_total_mb': round(rss_mb(root) * (workers > 1) + sum(worker_rss) + sum(map(rss_mb, pool_pids)), 1),
+        'pool_processes': len(pool_pids),
+    }
+
+
+def start_server(workers: int) -> tuple[float, dict[str, float]]:
+    port = free_port()
+    env = dict(os.environ, WORKERS=str(workers), PROJECT_PORT=str(port), ACCESS_LOG_SAMPLE_RATE='0')
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'src.main'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(base_url=f'http://127.0.0.1:{port}', timeout=1) as client:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f'Сервер завершился с кодом {process.returncode}')
+                if time.perf_counter() - start > STARTUP_TIMEOUT:
+                    raise TimeoutError('Сервер не ответил за отведённое время')
+                try:
+                    if client.get('/metrics').status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.02)
+        elapsed = time.perf_counter() - start
+        # остальные воркеры могут ещё прогреваться
+        time.sleep(1)
+        return elapsed, measure_memory(process.pid, workers)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(STARTUP_TIMEOUT)
+
+
+def main() -> None:
+    parser = make_parser(__doc__)
+    parser.add_argument('--workers', default='1,2')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    prepare_database()
+    results = [
+        summarize('import src.main', time_command('import src.main', args.repeat)),
+        summarize('import src.main + imaging',
+                  time_command('import src.main, cv2, numpy, qrcode, PIL.Image', args.repeat)),
+    ]
+    for workers in map(int, args.workers.split(',')):
+        samples, memory = [], {}
+        for _ in range(args.repeat):
+            elapsed, memory = start_server(workers)
+            samples.append(elapsed)
+        results.append(summarize(f'startup workers={workers}', samples, **memory))
+    report('startup', results, args.output)
+    for result in results:
+        if 'rss_worker_mb' in result:
+            print(f"{result['name']}: {result['rss_worker_mb']} МБ на воркер, {result['rss_total_mb']} МБ всего, "
+                  f"процессов в пулах: {result['pool_processes']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from typing import Any, Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(name: str, samples: list[float], elapsed: float | None = None, **extra: Any) -> dict[str, Any]:
+    # samples - длительности отдельных операций в секундах
+    elapsed = elapsed if elapsed is not None else sum(samples)
+    return {
+        'name': name,
+        'count': len(samples),
+        'throughput': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+        **extra,
+    }
+
+
+def measure(func: Callable[[], Any], repeat: int, warmup: int = 3) -> list[float]:
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def environment() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def make_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--output', help='дописать результаты в файл в формате JSON Lines')
+    return parser
+
+
+def report(suite: str, results: list[dict[str, Any]], output: str | None = None) -> None:
+    columns = ('name', 'count', 'throughput', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms')
+    width = max([len(result['name']) for result in results] + [len(columns[0])])
+    print(f'{columns[0]:<{width}}' + ''.join(f'{column:>12}' for column in columns[1:]))
+    for result in results:
+        print(f"{result['name']:<{width}}" + ''.join(f'{result[column]:>12}' for column in columns[1:]))
+    if output:
+        record = {'suite': suite, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), **environment(), 'results': results}
+        with open(output, 'a') as file:
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
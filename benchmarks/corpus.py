@@ -0,0 +1,48 @@
+import uuid
+
+import cv2
+import numpy as np
+
+from src.services.qr import render
+
+# типичные размеры кадров: веб-камера турникета, старый телефон, 5 Мп и 12 Мп камеры
+PHOTO_SIZES = {
+    'vga': (640, 480),
+    '2mp': (1600, 1200),
+    '5mp': (2592, 1944),
+    '12mp': (4032, 3024),
+}
+
+
+def make_photo(data: str, size: tuple[int, int], seed: int = 0, quality: int = 90) -> bytes:
+    # «фотография» QR-кода: размытый шумный фон, код занимает ~20% кадра,
+    # слегка повёрнут и неравномерно освещён; кодируется в JPEG, как с камеры телефона
+    rng = np.random.default_rng(seed)
+    width, height = size
+    background = rng.integers(60, 200, (height // 8 + 1, width // 8 + 1), dtype=np.uint8)
+    frame = cv2.resize(background, (width, height), interpolation=cv2.INTER_CUBIC)
+    code = cv2.imdecode(np.frombuffer(render(data, 'png1'), dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    side = int(min(width, height) * 0.45)
+    code = cv2.resize(code, (side, side), interpolation=cv2.INTER_NEAREST)
+    matrix = cv2.getRotationMatrix2D((side / 2, side / 2), float(rng.uniform(-12, 12)), 1.0)
+    code = cv2.warpAffine(code, matrix, (side, side), borderValue=255)
+    left = int(rng.integers(0, width - side))
+    top = int(rng.integers(0, height - side))
+    frame[top:top + side, left:left + side] = code
+    light = np.linspace(0.75, 1.0, width, dtype=np.float32)[None, :]
+    frame = np.clip(frame.astype(np.float32) * light + rng.normal(0, 4, frame.shape), 0, 255).astype(np.uint8)
+    ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError('не удалось закодировать кадр')
+    return encoded.tobytes()
+
+
+def make_corpus(per_size: int = 3) -> dict[str, list[tuple[str, bytes]]]:
+    corpus = {}
+    for name, size in PHOTO_SIZES.items():
+        items = []
+        for seed in range(per_size):
+            data = str(uuid.UUID(int=seed + 1))
+            items.append((data, make_photo(data, size, seed)))
+        corpus[name] = items
+    return corpus
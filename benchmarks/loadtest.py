@@ -0,0 +1,103 @@
+"""Нагрузочный сценарий «обеденный пик» против запущенного сервера.
+
+    python -m src.main                        # в отдельном терминале
+    python -m benchmarks.loadtest --url http://127.0.0.1:8080 --duration 30 --concurrency 32
+
+Смесь запросов задаётся --mix: scan - POST /meals с фотографией купона,
+checkin - POST /meals/checkin по uuid, list - страница GET /tickets,
+qr - POST /qr (повторные запросы идут с If-None-Match, как у киосков).
+"""
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+
+from benchmarks.app import issue_tickets
+from benchmarks.common import make_parser, report, summarize
+from benchmarks.corpus import PHOTO_SIZES, make_photo
+
+DEFAULT_MIX = 'scan=60,checkin=10,list=20,qr=10'
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for item in value.split(','):
+        name, weight = item.split('=')
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+async def run(url: str, duration: float, concurrency: int, tickets_count: int, mix: dict[str, int],
+              size: str, seed: int) -> list[dict]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        tickets = await issue_tickets(client, tickets_count)
+        photos = [make_photo(ticket, PHOTO_SIZES[size], number) for number, ticket in enumerate(tickets[:50])]
+        etags: dict[str, str] = {}
+
+        async def scan(rng: random.Random) -> httpx.Response:
+            photo = rng.choice(photos)
+            return await client.post('/api/v1/meals', files={'file': ('scan.jpg', photo, 'image/jpeg')})
+
+        async def checkin(rng: random.Random) -> httpx.Response:
+            return await client.post('/api/v1/meals/checkin', json={'uuid': rng.choice(tickets)})
+
+        async def list_tickets(rng: random.Random) -> httpx.Response:
+            return await client.get('/api/v1/tickets', params={'limit': 100})
+
+        async def qr(rng: random.Random) -> httpx.Response:
+            ticket = rng.choice(tickets)
+            headers = {'If-None-Match': etags[ticket]} if ticket in etags else {}
+            response = await client.post('/api/v1/qr', json={'uuid': ticket}, headers=headers)
+            if 'etag' in response.headers:
+                etags[ticket] = response.headers['etag']
+            return response
+
+        operations = {'scan': scan, 'checkin': checkin, 'list': list_tickets, 'qr': qr}
+        names = [name for name in mix if mix[name] > 0]
+        weights = [mix[name] for name in names]
+        samples: dict[str, list[float]] = {name: [] for name in names}
+        statuses: dict[str, dict[int, int]] = {name: {} for name in names}
+        deadline = time.perf_counter() + duration
+
+        async def worker(number: int) -> None:
+            rng = random.Random(seed + number)
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                try:
+                    status = (await operations[name](rng)).status_code
+                except httpx.HTTPError:
+                    status = 0
+                samples[name].append(time.perf_counter() - start)
+                statuses[name][status] = statuses[name].get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(number) for number in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    results = [summarize(name, samples[name], elapsed, statuses=statuses[name]) for name in names]
+    results.append(summarize('total', [sample for name in names for sample in samples[name]], elapsed))
+    return results
+
+
+def main() -> None:
+    parser = make_parser(__doc__)
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--tickets', type=int, default=500)
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--size', default='vga')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    results = asyncio.run(run(args.url, args.duration, args.concurrency, args.tickets,
+                              parse_mix(args.mix), args.size, args.seed))
+    report('loadtest', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
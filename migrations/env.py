@@ -1,5 +1,4 @@
 import asyncio
-import os
 from logging.config import fileConfig
 
 from alembic import context
@@ -14,7 +13,7 @@ from src.models.users import Meal, Ticket, User
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
-config.set_main_option('sqlalchemy.url', os.environ['DSN'])
+config.set_main_option('sqlalchemy.url', DSN.replace('%', '%%'))
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
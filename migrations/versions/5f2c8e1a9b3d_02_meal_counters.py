@@ -0,0 +1,42 @@
+"""02_meal-counters
+
+Revision ID: 5f2c8e1a9b3d
+Revises: db0b268701c8
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f2c8e1a9b3d'
+down_revision: Union[str, None] = 'db0b268701c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('meal_counters',
+    sa.Column('ticket_uuid', sa.Uuid(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ticket_uuid'], ['tickets.uuid'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ticket_uuid', 'day')
+    )
+    meals = sa.table('meals', sa.column('ticket_uuid'), sa.column('time', sa.DateTime()))
+    if op.get_context().dialect.name == 'sqlite':
+        day = sa.func.date(meals.c.time)
+    else:
+        day = sa.cast(meals.c.time, sa.Date)
+    op.execute(
+        sa.table('meal_counters', sa.column('ticket_uuid'), sa.column('day'), sa.column('count')).insert()
+        .from_select(['ticket_uuid', 'day', 'count'],
+                     sa.select(meals.c.ticket_uuid, day, sa.func.count()).group_by(meals.c.ticket_uuid, day))
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('meal_counters')
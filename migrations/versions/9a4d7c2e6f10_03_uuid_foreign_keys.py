@@ -0,0 +1,89 @@
+"""03_uuid-foreign-keys
+
+Revision ID: 9a4d7c2e6f10
+Revises: 5f2c8e1a9b3d
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4d7c2e6f10'
+down_revision: Union[str, None] = '5f2c8e1a9b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name == 'sqlite':
+        # SQLite не умеет менять тип столбца: таблицы пересоздаются, данные копируются пачками.
+        # Значения уже хранятся как 32-символьный hex, т.е. в формате sa.Uuid
+        rebuild_tickets(sa.Uuid)
+        rebuild_meals(sa.Uuid)
+    else:
+        op.alter_column('tickets', 'user_uuid', type_=sa.Uuid(), postgresql_using='user_uuid::uuid')
+        op.alter_column('meals', 'ticket_uuid', type_=sa.Uuid(), postgresql_using='ticket_uuid::uuid')
+    op.create_index('ix_meals_ticket_uuid_time', 'meals', ['ticket_uuid', 'time'], unique=False)
+    op.create_index(op.f('ix_meals_time'), 'meals', ['time'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_meals_time'), table_name='meals')
+    op.drop_index('ix_meals_ticket_uuid_time', table_name='meals')
+    if op.get_context().dialect.name == 'sqlite':
+        rebuild_tickets(sa.Integer)
+        rebuild_meals(sa.Integer)
+
+
+def rebuild_tickets(reference_type: type[sa.types.TypeEngine]) -> None:
+    op.create_table('tickets_new',
+    sa.Column('uuid', sa.Uuid(), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=True),
+    sa.Column('user_uuid', reference_type(), nullable=False),
+    sa.ForeignKeyConstraint(['user_uuid'], ['users.uuid'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('uuid'),
+    sa.UniqueConstraint('user_uuid')
+    )
+    copy_in_batches('tickets', 'tickets_new', ('uuid', 'created', 'user_uuid'), 'uuid')
+    op.drop_table('tickets')
+    op.rename_table('tickets_new', 'tickets')
+
+
+def rebuild_meals(reference_type: type[sa.types.TypeEngine]) -> None:
+    op.create_table('meals_new',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ticket_uuid', reference_type(), nullable=False),
+    sa.Column('time', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['ticket_uuid'], ['tickets.uuid'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    copy_in_batches('meals', 'meals_new', ('id', 'ticket_uuid', 'time'), 'id')
+    op.drop_index(op.f('ix_meals_id'), table_name='meals')
+    op.drop_table('meals')
+    op.rename_table('meals_new', 'meals')
+    op.create_index(op.f('ix_meals_id'), 'meals', ['id'], unique=False)
+
+
+def copy_in_batches(source: str, target: str, columns: Sequence[str], key: str) -> None:
+    names = ', '.join(columns)
+    if context.is_offline_mode():
+        op.execute(f'INSERT INTO {target} ({names}) SELECT {names} FROM {source}')
+        return
+    bind = op.get_bind()
+    last = None
+    while True:
+        condition = '' if last is None else f'WHERE {key} > :last '
+        result = bind.execute(
+            sa.text(f'INSERT INTO {target} ({names}) '
+                    f'SELECT {names} FROM {source} {condition}ORDER BY {key} LIMIT {BATCH_SIZE}'),
+            {'last': last},
+        )
+        if result.rowcount < BATCH_SIZE:
+            break
+        last = bind.execute(sa.text(f'SELECT max({key}) FROM {target}')).scalar()
@@ -0,0 +1,49 @@
+"""07_meals-autoincrement
+
+Revision ID: a2c4e6b8d0f1
+Revises: f1a3c5e7b9d4
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2c4e6b8d0f1'
+down_revision: Union[str, None] = 'f1a3c5e7b9d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # SQLite без AUTOINCREMENT снова выдаёт id удалённых строк, и отметка с id, уже перенесённым
+    # в meals_archive, терялась при следующем переносе. В PostgreSQL id берутся из последовательности
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    connection = op.get_bind()
+    last_id = connection.scalar(sa.text(
+        'SELECT max(id) FROM (SELECT id FROM meals UNION ALL SELECT id FROM meals_archive)'
+    )) or 0
+    # отметкам, чей id уже занят в архиве, выдаются новые
+    clashes = connection.scalars(sa.text(
+        'SELECT id FROM meals WHERE id IN (SELECT id FROM meals_archive) ORDER BY id'
+    )).all()
+    for number, meal_id in enumerate(clashes, start=1):
+        connection.execute(sa.text('UPDATE meals SET id = :new_id WHERE id = :id'),
+                           {'new_id': last_id + number, 'id': meal_id})
+    last_id += len(clashes)
+    with op.batch_alter_table('meals', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+        pass
+    # новые id выдаются после наибольшего из meals и meals_archive
+    op.execute(sa.text("DELETE FROM sqlite_sequence WHERE name = 'meals'"))
+    connection.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES ('meals', :seq)"), {'seq': last_id})
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('meals', recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+        pass
@@ -0,0 +1,42 @@
+"""08_daily-totals-at-query-time
+
+Revision ID: b4d6f8a0c2e3
+Revises: a2c4e6b8d0f1
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d6f8a0c2e3'
+down_revision: Union[str, None] = 'a2c4e6b8d0f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # итоги дня считаются при запросе из meal_counters: общая строка дня в meal_daily_totals
+    # обновлялась каждой отметкой и выстраивала все турникеты в очередь за её блокировкой
+    op.create_index(op.f('ix_meal_counters_day'), 'meal_counters', ['day'], unique=False)
+    op.drop_table('meal_daily_totals')
+
+
+def downgrade() -> None:
+    op.create_table('meal_daily_totals',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('meals', sa.Integer(), nullable=False),
+    sa.Column('tickets', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    counters = sa.table('meal_counters', sa.column('day', sa.Date()), sa.column('count', sa.Integer()))
+    op.execute(
+        sa.table('meal_daily_totals', sa.column('day'), sa.column('meals'), sa.column('tickets')).insert()
+        .from_select(['day', 'meals', 'tickets'],
+                     sa.select(counters.c.day, sa.func.sum(counters.c.count), sa.func.count())
+                     .where(counters.c.count > 0).group_by(counters.c.day))
+    )
+    op.drop_index(op.f('ix_meal_counters_day'), table_name='meal_counters')
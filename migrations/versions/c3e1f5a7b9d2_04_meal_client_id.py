@@ -0,0 +1,29 @@
+"""04_meal-client-id
+
+Revision ID: c3e1f5a7b9d2
+Revises: 9a4d7c2e6f10
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e1f5a7b9d2'
+down_revision: Union[str, None] = '9a4d7c2e6f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('meals', sa.Column('client_id', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_meals_client_id'), 'meals', ['client_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_meals_client_id'), table_name='meals')
+    with op.batch_alter_table('meals') as batch_op:
+        batch_op.drop_column('client_id')
@@ -0,0 +1,38 @@
+"""09_timestamps-with-time-zone
+
+Revision ID: c6e8a0b2d4f5
+Revises: b4d6f8a0c2e3
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6e8a0b2d4f5'
+down_revision: Union[str, None] = 'b4d6f8a0c2e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (('tickets', 'created'), ('meals', 'time'), ('meals_archive', 'time'))
+
+
+def upgrade() -> None:
+    # время приходит с часовым поясом UTC, а asyncpg не передаёт такое значение в timestamp without time zone.
+    # Сохранённые значения уже в UTC. В SQLite тип не меняется: время хранится строкой
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    for table, column in COLUMNS:
+        op.alter_column(table, column, type_=sa.DateTime(timezone=True), existing_type=sa.DateTime(),
+                        postgresql_using=f"{column} AT TIME ZONE 'UTC'")
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    for table, column in COLUMNS:
+        op.alter_column(table, column, type_=sa.DateTime(), existing_type=sa.DateTime(timezone=True),
+                        postgresql_using=f"{column} AT TIME ZONE 'UTC'")
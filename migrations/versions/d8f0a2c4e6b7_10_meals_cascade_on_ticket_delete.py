@@ -0,0 +1,49 @@
+"""10_meals-cascade-on-ticket-delete
+
+Revision ID: d8f0a2c4e6b7
+Revises: c6e8a0b2d4f5
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f0a2c4e6b7'
+down_revision: Union[str, None] = 'c6e8a0b2d4f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# имя, которое PostgreSQL дал безымянному ключу из 01_initial_db, и имя безымянного ключа при пересоздании в SQLite
+CONSTRAINT = 'meals_ticket_uuid_fkey'
+NAMING_CONVENTION = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+
+def upgrade() -> None:
+    # отметки удаляются вместе с купоном (и с пользователем через купон), как и meal_counters
+    replace_foreign_key('CASCADE')
+
+
+def downgrade() -> None:
+    replace_foreign_key(None)
+
+
+def replace_foreign_key(ondelete: str | None) -> None:
+    if op.get_context().dialect.name != 'sqlite':
+        op.drop_constraint(CONSTRAINT, 'meals', type_='foreignkey')
+        op.create_foreign_key(CONSTRAINT, 'meals', 'tickets', ['ticket_uuid'], ['uuid'], ondelete=ondelete)
+        return
+    # SQLite меняет внешний ключ только пересозданием таблицы; при этом сбрасывается счётчик AUTOINCREMENT,
+    # который после 07_meals-autoincrement учитывает и id из meals_archive
+    connection = op.get_bind()
+    seq = connection.scalar(sa.text("SELECT seq FROM sqlite_sequence WHERE name = 'meals'"))
+    with op.batch_alter_table('meals', recreate='always', naming_convention=NAMING_CONVENTION,
+                              table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        batch_op.drop_constraint(CONSTRAINT, type_='foreignkey')
+        batch_op.create_foreign_key(CONSTRAINT, 'tickets', ['ticket_uuid'], ['uuid'], ondelete=ondelete)
+    if seq is not None:
+        op.execute(sa.text("DELETE FROM sqlite_sequence WHERE name = 'meals'"))
+        connection.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES ('meals', :seq)"), {'seq': seq})
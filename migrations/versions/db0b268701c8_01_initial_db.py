@@ -19,6 +19,12 @@ depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
+    # в SQLite внешние ключи исторически объявлены как Integer; PostgreSQL требует
+    # совпадения типа внешнего ключа с типом первичного ключа
+    if op.get_context().dialect.name == 'sqlite':
+        uuid_reference = sa.Integer
+    else:
+        uuid_reference = sa.Uuid
     # ### commands auto generated by Alembic - please adjust! ###
     op.create_table('users',
     sa.Column('uuid', sa.Uuid(), nullable=False),
@@ -29,14 +35,14 @@ def upgrade() -> None:
     op.create_table('tickets',
     sa.Column('uuid', sa.Uuid(), nullable=False),
     sa.Column('created', sa.DateTime(), nullable=True),
-    sa.Column('user_uuid', sa.Integer(), nullable=False),
+    sa.Column('user_uuid', uuid_reference(), nullable=False),
     sa.ForeignKeyConstraint(['user_uuid'], ['users.uuid'], ondelete='CASCADE'),
     sa.PrimaryKeyConstraint('uuid'),
     sa.UniqueConstraint('user_uuid')
     )
     op.create_table('meals',
     sa.Column('id', sa.Integer(), nullable=False),
-    sa.Column('ticket_uuid', sa.Integer(), nullable=False),
+    sa.Column('ticket_uuid', uuid_reference(), nullable=False),
     sa.Column('time', sa.DateTime(), nullable=True),
     sa.ForeignKeyConstraint(['ticket_uuid'], ['tickets.uuid'], ),
     sa.PrimaryKeyConstraint('id')
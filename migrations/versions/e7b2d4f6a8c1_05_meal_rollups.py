@@ -0,0 +1,59 @@
+"""05_meal-rollups
+
+Revision ID: e7b2d4f6a8c1
+Revises: c3e1f5a7b9d2
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b2d4f6a8c1'
+down_revision: Union[str, None] = 'c3e1f5a7b9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('meal_daily_totals',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('meals', sa.Integer(), nullable=False),
+    sa.Column('tickets', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('meal_monthly_counters',
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('ticket_uuid', sa.Uuid(), nullable=False),
+    sa.Column('meals', sa.Integer(), nullable=False),
+    sa.Column('days', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('month', 'ticket_uuid')
+    )
+    # заполняются из meal_counters, где приёмы пищи уже сгруппированы по купону и дню
+    counters = sa.table('meal_counters', sa.column('ticket_uuid'), sa.column('day', sa.Date()),
+                        sa.column('count', sa.Integer()))
+    if op.get_context().dialect.name == 'sqlite':
+        month = sa.func.date(counters.c.day, 'start of month')
+    else:
+        month = sa.cast(sa.func.date_trunc('month', counters.c.day), sa.Date)
+    op.execute(
+        sa.table('meal_daily_totals', sa.column('day'), sa.column('meals'), sa.column('tickets')).insert()
+        .from_select(['day', 'meals', 'tickets'],
+                     sa.select(counters.c.day, sa.func.sum(counters.c.count), sa.func.count())
+                     .where(counters.c.count > 0).group_by(counters.c.day))
+    )
+    op.execute(
+        sa.table('meal_monthly_counters', sa.column('month'), sa.column('ticket_uuid'), sa.column('meals'),
+                 sa.column('days')).insert()
+        .from_select(['month', 'ticket_uuid', 'meals', 'days'],
+                     sa.select(month, counters.c.ticket_uuid, sa.func.sum(counters.c.count), sa.func.count())
+                     .where(counters.c.count > 0).group_by(month, counters.c.ticket_uuid))
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('meal_monthly_counters')
+    op.drop_table('meal_daily_totals')
@@ -0,0 +1,36 @@
+"""06_meals-archive
+
+Revision ID: f1a3c5e7b9d4
+Revises: e7b2d4f6a8c1
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a3c5e7b9d4'
+down_revision: Union[str, None] = 'e7b2d4f6a8c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('meals_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('ticket_uuid', sa.Uuid(), nullable=False),
+    sa.Column('time', sa.DateTime(), nullable=True),
+    sa.Column('client_id', sa.String(length=64), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_meals_archive_client_id'), 'meals_archive', ['client_id'], unique=False)
+    op.create_index(op.f('ix_meals_archive_time'), 'meals_archive', ['time'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_meals_archive_time'), table_name='meals_archive')
+    op.drop_index(op.f('ix_meals_archive_client_id'), table_name='meals_archive')
+    op.drop_table('meals_archive')
@@ -1,13 +1,20 @@
-from typing import Any, Optional
+import datetime
+from typing import Annotated, Any, Optional, Union
 
-from fastapi import APIRouter, Depends, Response, UploadFile, status
+from fastapi import APIRouter, Body, Depends, Header, Query, Response, UploadFile, status
 # from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.api.v1.schemas import MealIn, MealsOut, TicketOut, TicketUUID, UserIn, UserOut, UserUUID
-from src.db.database import get_session
-from src.services.base import (create_qr, create_ticket, create_user, meal_delete, create_meal, retrieve_tickets,
-                               retrieve_meals, ticket_delete, user_delete)
+from src.api.v1.schemas import (CheckInBatch, CheckInIn, CheckInOut, DailyReportOut, GroupCheckInOut, ListFormat,
+                                MealIn, MealsOut, MealSyncIn, MealSyncOut, QRFormat, ReportsRebuildOut, TicketOut,
+                                TicketUUID, UserDailyReportOut, UserIn, UserOut, UserReportOut, UsersBulkIn, UserUUID)
+from src.core.config import CHECK_IN_BATCH_MAX
+from src.db.database import get_read_session, get_session
+from src.services.base import (create_qr, create_ticket, create_tickets_bulk, create_user, meal_delete, create_meal,
+                               create_group_meal, create_meals_by_uuid, retrieve_tickets, retrieve_meals, sync_meals,
+                               ticket_delete, user_delete)
+from src.services.reports import (rebuild_reports, retrieve_daily_report, retrieve_users_daily_report,
+                                  retrieve_users_report)
 
 router = APIRouter()
 
@@ -45,13 +52,31 @@ async def add_ticket(user: UserUUID,
     return await create_ticket(user, session)
 
 
+@router.post('/tickets/bulk',
+             response_model=None,
+             status_code=status.HTTP_201_CREATED,
+             summary='Выпустить купоны для группы пользователей',
+             description='Метод принимает список ФИО, в одной транзакции создаёт пользователей и купоны '
+                         'и возвращает ZIP-архив с QR-кодами купонов и файлом tickets.csv '
+                         '(ФИО, uuid пользователя, uuid купона)')
+async def add_tickets_bulk(users: UsersBulkIn,
+                           session: AsyncSession = Depends(get_session),
+                           fmt: QRFormat = Query(QRFormat.png, alias='format')) -> Response:
+    return await create_tickets_bulk(users.names, session, fmt.value)
+
+
 @router.get('/tickets',
             response_model=list[TicketOut],
             status_code=status.HTTP_200_OK,
             summary='Информация о купонах.',
-            description='Вернуть информацию о ранее созданных купонах.')
-async def get_tickets(session: AsyncSession = Depends(get_session)) -> Any:
-    return await retrieve_tickets(session)
+            description='Вернуть информацию о ранее созданных купонах. Если страница заполнена, '
+                        'в заголовке X-Next-Cursor возвращается курсор следующей страницы. '
+                        'format=ndjson отдаёт все купоны потоком, по одному JSON-объекту в строке.')
+async def get_tickets(session: AsyncSession = Depends(get_read_session),
+                      cursor: Optional[str] = None,
+                      limit: Optional[int] = Query(None, ge=1),
+                      fmt: ListFormat = Query(ListFormat.json, alias='format')) -> Response:
+    return await retrieve_tickets(session, cursor, limit, fmt.value)
 
 
 @router.delete('/tickets',
@@ -67,9 +92,14 @@ async def delete_ticket(ticket: TicketUUID, session: AsyncSession = Depends(get_
              response_model=None,
              status_code=status.HTTP_200_OK,
              summary='Получить QR-код',
-             description='Возвращает QR-код')
-async def get_qr(ticket_uuid: TicketUUID, session: AsyncSession = Depends(get_session)) -> Response:
-    return await create_qr(ticket_uuid, session)
+             description='Возвращает QR-код. Поддерживает ETag/If-None-Match: '
+                         'если изображение у клиента актуально, возвращается 304 без тела. '
+                         'Параметр format: png (по умолчанию), png1 (двухцветный PNG без PIL) или svg')
+async def get_qr(ticket_uuid: TicketUUID,
+                 session: AsyncSession = Depends(get_read_session),
+                 fmt: QRFormat = Query(QRFormat.png, alias='format'),
+                 if_none_match: Optional[str] = Header(None)) -> Response:
+    return await create_qr(ticket_uuid, session, fmt.value, if_none_match)
     # todo: сделать StreamingResponse?
     # def iter_file(file_obj):
     #     yield from file_obj
@@ -85,13 +115,63 @@ async def add_meal(file: UploadFile, session: AsyncSession = Depends(get_session
     return await create_meal(file, session)
 
 
+@router.post('/meals/group',
+             response_model=GroupCheckInOut,
+             status_code=status.HTTP_200_OK,
+             summary='Отметить приём пищи по всем QR-кодам на снимке',
+             description='Распознаёт все QR-коды на одном изображении и делает отметки одной транзакцией. '
+                         'Для каждого кода в порядке обнаружения возвращается статус: created, not_found, '
+                         'limit_reached, duplicate (купон уже был на снимке), invalid (на коде не купон) или '
+                         'rejected (подпись, срок действия или отзыв купона); undecoded - число найденных, '
+                         'но не распознанных кодов')
+async def add_group_meal(file: UploadFile, session: AsyncSession = Depends(get_session)) -> Any:
+    return await create_group_meal(file, session)
+
+
+@router.post('/meals/checkin',
+             response_model=Union[CheckInOut, list[CheckInOut]],
+             status_code=status.HTTP_200_OK,
+             summary='Сделать отметку о приёме пищи по uuid купона',
+             description='Для сканеров, которые сами распознают QR-код. Принимает купон или список купонов: '
+                         'data - содержимое QR-кода, которое проверяется так же, как код со снимка (подпись, срок '
+                         'действия, отзыв), или uuid - для него действуют правила кодов без подписи. '
+                         'Для одного купона ответ такой же, как у POST /meals; для списка все отметки делаются '
+                         'одной транзакцией и возвращается результат по каждому купону: '
+                         'created, not_found, limit_reached, invalid или rejected')
+async def add_meals_by_uuid(tickets: Union[CheckInIn, CheckInBatch],
+                            session: AsyncSession = Depends(get_session)) -> Any:
+    return await create_meals_by_uuid(tickets, session)
+
+
+@router.post('/meals/sync',
+             response_model=list[MealSyncOut],
+             status_code=status.HTTP_200_OK,
+             summary='Загрузить отметки, накопленные сканером без связи',
+             description='Принимает пачку записей (ticket_uuid или data - содержимое QR-кода, время сканирования, '
+                         'client_id - уникальный идентификатор записи на сканере). Код проверяется как в '
+                         'POST /meals/checkin, срок действия - на день сканирования. Время сканирования из будущего, '
+                         'раньше выпуска купона или старше SYNC_MAX_AGE_DAYS дней даёт invalid. Записи с уже '
+                         'загруженным client_id пропускаются, поэтому пачку можно безопасно отправлять повторно. '
+                         'Лимит приёмов пищи проверяется по дню сканирования; всё применяется одной транзакцией. '
+                         'Для каждой записи возвращается статус: created, duplicate, not_found, limit_reached, '
+                         'invalid или rejected')
+async def add_meals_sync(records: Annotated[list[MealSyncIn], Body(min_length=1, max_length=CHECK_IN_BATCH_MAX)],
+                         session: AsyncSession = Depends(get_session)) -> Any:
+    return await sync_meals(records, session)
+
+
 @router.get('/meals',
             response_model=list[MealsOut],
             status_code=status.HTTP_200_OK,
             summary='Информация об отметках времени приёма пищи',
-            description='Получить информацию об отметках времени приёма пищи')
-async def get_meals(session: AsyncSession = Depends(get_session)) -> Any:
-    return await retrieve_meals(session)
+            description='Получить информацию об отметках времени приёма пищи. Если страница заполнена, '
+                        'в заголовке X-Next-Cursor возвращается курсор следующей страницы. '
+                        'format=ndjson отдаёт все отметки потоком, по одному JSON-объекту в строке.')
+async def get_meals(session: AsyncSession = Depends(get_read_session),
+                    cursor: Optional[str] = None,
+                    limit: Optional[int] = Query(None, ge=1),
+                    fmt: ListFormat = Query(ListFormat.json, alias='format')) -> Response:
+    return await retrieve_meals(session, cursor, limit, fmt.value)
 
 
 @router.delete('/meals',
@@ -100,3 +180,47 @@ async def get_meals(session: AsyncSession = Depends(get_session)) -> Any:
                summary='Удалить отметку о приёме пищи')
 async def delete_meal(meal: MealIn, session: AsyncSession = Depends(get_session)) -> Any:
     return await meal_delete(meal, session)
+
+
+@router.get('/reports/daily',
+            response_model=list[DailyReportOut],
+            status_code=status.HTTP_200_OK,
+            summary='Приёмы пищи по дням',
+            description='Для каждого дня периода с приёмами пищи возвращает их число и число купонов, '
+                        'по которым ели. Считается по счётчикам купонов за день, без чтения отметок')
+async def get_daily_report(date_from: datetime.date, date_to: datetime.date,
+                           session: AsyncSession = Depends(get_read_session)) -> Any:
+    return await retrieve_daily_report(date_from, date_to, session)
+
+
+@router.get('/reports/users/daily',
+            response_model=list[UserDailyReportOut],
+            status_code=status.HTTP_200_OK,
+            summary='Приёмы пищи по дням и купонам',
+            description='Для каждого дня периода и каждого купона, по которому в этот день ели, возвращает '
+                        'владельца и число приёмов пищи')
+async def get_users_daily_report(date_from: datetime.date, date_to: datetime.date,
+                                 session: AsyncSession = Depends(get_read_session)) -> Any:
+    return await retrieve_users_daily_report(date_from, date_to, session)
+
+
+@router.get('/reports/users',
+            response_model=list[UserReportOut],
+            status_code=status.HTTP_200_OK,
+            summary='Использование купонов за месяц',
+            description='Для каждого купона, по которому ели в месяце (month в формате ГГГГ-ММ), возвращает '
+                        'владельца, число приёмов пищи, число дней с приёмами пищи и долю использованного '
+                        'лимита (utilization) за прошедшие дни месяца')
+async def get_users_report(month: str, session: AsyncSession = Depends(get_read_session)) -> Any:
+    return await retrieve_users_report(month, session)
+
+
+@router.post('/reports/rebuild',
+             response_model=ReportsRebuildOut,
+             status_code=status.HTTP_200_OK,
+             summary='Пересчитать итоги для отчётов',
+             description='Пересчитывает итоги купонов по месяцам из отметок о приёме пищи, включая архивные, '
+                         'за месяцы, покрывающие период. В обычной работе итоги обновляются при каждой отметке')
+async def post_reports_rebuild(date_from: datetime.date, date_to: datetime.date,
+                               session: AsyncSession = Depends(get_session)) -> Any:
+    return await rebuild_reports(date_from, date_to, session)
@@ -1,7 +1,15 @@
 import datetime
+from enum import Enum
+from typing import Annotated, Optional
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
+
+from src.core.config import BULK_MAX_USERS, CHECK_IN_BATCH_MAX
+from src.models.users import CLIENT_ID_MAX_LENGTH
+
+# подписанный код - 48 символов, голый uuid - 36; запас на коды других форматов
+QR_DATA_MAX_LENGTH = 128
 
 
 class UserIn(BaseModel):
@@ -16,6 +24,10 @@ class UserOut(UserIn, UserUUID):
     pass
 
 
+class UsersBulkIn(BaseModel):
+    names: list[str] = Field(min_length=1, max_length=BULK_MAX_USERS)
+
+
 class TicketUUID(BaseModel):
     uuid: UUID
 
@@ -32,3 +44,103 @@ class MealIn(BaseModel):
 class MealsOut(MealIn):
     ticket_uuid: UUID
     time: datetime.datetime
+
+
+class QRFormat(str, Enum):
+    png = 'png'
+    png1 = 'png1'
+    svg = 'svg'
+
+
+class ListFormat(str, Enum):
+    json = 'json'
+    ndjson = 'ndjson'
+
+
+class CheckInStatus(str, Enum):
+    created = 'created'
+    not_found = 'not_found'
+    limit_reached = 'limit_reached'
+    duplicate = 'duplicate'
+    # на коде не купон / подпись, срок действия или отзыв не прошли проверку
+    invalid = 'invalid'
+    rejected = 'rejected'
+
+
+class CheckInIn(BaseModel):
+    # data - содержимое QR-кода как есть, проверяется так же, как код со снимка; uuid - уже извлечённый из кода
+    uuid: Optional[UUID] = None
+    data: Optional[str] = Field(None, min_length=1, max_length=QR_DATA_MAX_LENGTH)
+
+    @model_validator(mode='after')
+    def check_ticket(self) -> 'CheckInIn':
+        if (self.uuid is None) == (self.data is None):
+            raise ValueError('Нужно указать либо uuid купона, либо data - содержимое QR-кода')
+        return self
+
+
+class CheckInOut(BaseModel):
+    uuid: Optional[UUID]
+    status: CheckInStatus
+
+
+CheckInBatch = Annotated[list[CheckInIn], Field(min_length=1, max_length=CHECK_IN_BATCH_MAX)]
+
+
+class MealSyncIn(BaseModel):
+    ticket_uuid: Optional[UUID] = None
+    data: Optional[str] = Field(None, min_length=1, max_length=QR_DATA_MAX_LENGTH)
+    time: datetime.datetime
+    client_id: str = Field(min_length=1, max_length=CLIENT_ID_MAX_LENGTH)
+
+    @model_validator(mode='after')
+    def check_ticket(self) -> 'MealSyncIn':
+        if (self.ticket_uuid is None) == (self.data is None):
+            raise ValueError('Нужно указать либо ticket_uuid, либо data - содержимое QR-кода')
+        return self
+
+
+class MealSyncOut(BaseModel):
+    client_id: str
+    ticket_uuid: Optional[UUID]
+    status: CheckInStatus
+
+
+class GroupCheckInItem(BaseModel):
+    data: str
+    uuid: Optional[UUID]
+    status: CheckInStatus
+
+
+class GroupCheckInOut(BaseModel):
+    results: list[GroupCheckInItem]
+    undecoded: int
+
+
+class DailyReportOut(BaseModel):
+    day: datetime.date
+    meals: int
+    tickets: int
+
+
+class UserDailyReportOut(BaseModel):
+    day: datetime.date
+    ticket_uuid: UUID
+    user_uuid: UUID
+    name: str
+    meals: int
+
+
+class UserReportOut(BaseModel):
+    ticket_uuid: UUID
+    user_uuid: Optional[UUID]
+    name: Optional[str]
+    meals: int
+    days: int
+    utilization: float
+
+
+class ReportsRebuildOut(BaseModel):
+    date_from: datetime.date
+    date_to: datetime.date
+    tickets: int
@@ -1,18 +1,116 @@
 import os
-from logging import config as logging_config
 
 from dotenv import load_dotenv
 
-from src.core.logger import LOGGING
-
-logging_config.dictConfig(LOGGING)
 load_dotenv()
 
+
+def getenv_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
 PROJECT_NAME = os.getenv('PROJECT_NAME', 'dining room')
 PROJECT_HOST = os.getenv('PROJECT_HOST', '127.0.0.1')
 PROJECT_PORT = int(os.getenv('PROJECT_PORT', '8080'))
+# процессы uvicorn ничего не делят между собой: у каждого свои пулы, кэш QR, метрики и индекс купонов
+WORKERS = int(os.getenv('WORKERS', '1'))
+# ядра делятся между воркерами uvicorn, иначе каждый заводит пулы на все ядра машины
+CPU_PER_WORKER = max((os.cpu_count() or 1) // max(WORKERS, 1), 1)
+RELOAD = getenv_bool('RELOAD', False)
+GRACEFUL_TIMEOUT = int(os.getenv('GRACEFUL_TIMEOUT', '30'))
+WARMUP_DB_CONNECTIONS = int(os.getenv('WARMUP_DB_CONNECTIONS', '2'))
+# прогрев поднимает пул декодера при старте в каждом воркере, чтобы первый скан не ждал запуска процессов;
+# без него пулы декодера и рендера запускаются при первой задаче
+WARMUP_DECODER = getenv_bool('WARMUP_DECODER', True)
 MEALS_LIMIT = 2
 
 DSN = os.getenv(
     'DSN', 'sqlite+aiosqlite:///dining_room.db'
 )
+DB_ECHO = getenv_bool('DB_ECHO', False)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = getenv_bool('DB_POOL_PRE_PING', True)
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))
+# чтения (GET-списки, отчёты, проверка купона при выдаче QR) идут через отдельный пул и не занимают соединения
+# отметок: DSN_READ - реплика; без неё SQLITE_READ_POOL открывает на том же файле SQLite отдельный пул
+# соединений только для чтения (в режиме WAL читатели не ждут писателей). Без обоих чтения идут через основной пул
+DSN_READ = os.getenv('DSN_READ', '')
+SQLITE_READ_POOL = getenv_bool('SQLITE_READ_POOL', False)
+DB_READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', str(DB_POOL_SIZE)))
+
+DECODE_EXECUTOR = os.getenv('DECODE_EXECUTOR', 'process')
+DECODE_WORKERS = int(os.getenv('DECODE_WORKERS', str(CPU_PER_WORKER)))
+DECODE_QUEUE_SIZE = int(os.getenv('DECODE_QUEUE_SIZE', '32'))
+DECODE_TARGET_SIZE = int(os.getenv('DECODE_TARGET_SIZE', '1024'))
+
+QR_CACHE_MAX_BYTES = int(os.getenv('QR_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+QR_CACHE_DIR = os.getenv('QR_CACHE_DIR', '')
+
+RENDER_EXECUTOR = os.getenv('RENDER_EXECUTOR', 'process')
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', str(CPU_PER_WORKER)))
+RENDER_QUEUE_SIZE = int(os.getenv('RENDER_QUEUE_SIZE', '64'))
+# QR-коды новых купонов в форматах QR_PRERENDER_FORMATS рисуются фоновой очередью сразу после выпуска,
+# а при старте воркера (QR_PRERENDER_WARMUP) - для всех купонов, начиная с новых, которых ещё нет в кэше, так что
+# первый POST /qr берёт код из кэша. QR_PRERENDER_WARMUP_LIMIT > 0 ограничивает прогрев последними купонами:
+# без QR_CACHE_DIR кэш в памяти всё равно держит только QR_CACHE_MAX_BYTES
+QR_PRERENDER = getenv_bool('QR_PRERENDER', False)
+QR_PRERENDER_FORMATS = os.getenv('QR_PRERENDER_FORMATS', 'png')
+QR_PRERENDER_CONCURRENCY = int(os.getenv('QR_PRERENDER_CONCURRENCY', '1'))
+QR_PRERENDER_QUEUE_SIZE = int(os.getenv('QR_PRERENDER_QUEUE_SIZE', '10000'))
+QR_PRERENDER_WARMUP = getenv_bool('QR_PRERENDER_WARMUP', True)
+QR_PRERENDER_WARMUP_LIMIT = int(os.getenv('QR_PRERENDER_WARMUP_LIMIT', '0'))
+# сколько POST /qr ждёт код, который уже рисуется в фоне, прежде чем нарисовать его сам
+QR_PRERENDER_WAIT_TIMEOUT = float(os.getenv('QR_PRERENDER_WAIT_TIMEOUT', '2'))
+
+BULK_MAX_USERS = int(os.getenv('BULK_MAX_USERS', '10000'))
+BULK_INSERT_CHUNK = int(os.getenv('BULK_INSERT_CHUNK', '1000'))
+BULK_RENDER_CHUNK = int(os.getenv('BULK_RENDER_CHUNK', '50'))
+# фиксированная маска ускоряет генерацию QR-кода в ~5 раз; пусто - подбирать лучшую маску
+QR_MASK_PATTERN = int(os.environ['QR_MASK_PATTERN']) if os.getenv('QR_MASK_PATTERN') else None
+# подписанные QR-коды проверяются при скане без обращения к БД. QR_SIGNING_KEYS - 'номер:секрет' через запятую,
+# первым ключом подписываются новые коды, остальные только проверяются. Код действует QR_PAYLOAD_VALIDITY_DAYS
+# (до двух периодов); QR_ACCEPT_UNSIGNED - принимать коды с голым uuid, выпущенные до включения подписи
+QR_SIGNED_PAYLOADS = getenv_bool('QR_SIGNED_PAYLOADS', False)
+QR_SIGNING_KEYS = os.getenv('QR_SIGNING_KEYS', '')
+QR_PAYLOAD_VALIDITY_DAYS = int(os.getenv('QR_PAYLOAD_VALIDITY_DAYS', '180'))
+QR_ACCEPT_UNSIGNED = getenv_bool('QR_ACCEPT_UNSIGNED', True)
+# uuid отозванных купонов через запятую; удалённые купоны отзываются автоматически
+QR_REVOKED_TICKETS = os.getenv('QR_REVOKED_TICKETS', '')
+
+TICKET_INDEX_ENABLED = getenv_bool('TICKET_INDEX_ENABLED', False)
+
+MAX_IMAGE_SIZE = int(os.getenv('MAX_IMAGE_SIZE', str(10 * 1024 * 1024)))
+
+CHECK_IN_BATCH_MAX = int(os.getenv('CHECK_IN_BATCH_MAX', '500'))
+# время сканирования из /meals/sync принимается не позже SYNC_MAX_CLOCK_SKEW секунд от текущего, не раньше
+# выпуска купона (с тем же допуском на часы сканера) и не старше SYNC_MAX_AGE_DAYS дней; иначе запись - invalid
+SYNC_MAX_CLOCK_SKEW = int(os.getenv('SYNC_MAX_CLOCK_SKEW', '300'))
+SYNC_MAX_AGE_DAYS = int(os.getenv('SYNC_MAX_AGE_DAYS', '30'))
+# отметки из параллельных запросов копятся до MEAL_WRITE_BATCH_SIZE записей или MEAL_WRITE_BATCH_DELAY_MS
+# и записываются одной транзакцией
+MEAL_WRITE_BATCHING = getenv_bool('MEAL_WRITE_BATCHING', False)
+MEAL_WRITE_BATCH_SIZE = int(os.getenv('MEAL_WRITE_BATCH_SIZE', '100'))
+MEAL_WRITE_BATCH_DELAY_MS = float(os.getenv('MEAL_WRITE_BATCH_DELAY_MS', '5'))
+
+# отметки старше ARCHIVE_AFTER_DAYS дней переносятся в meals_archive фоновой задачей; 0 - не переносить
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '0'))
+ARCHIVE_INTERVAL = int(os.getenv('ARCHIVE_INTERVAL', '3600'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '1000'))
+ARCHIVE_BATCH_PAUSE = float(os.getenv('ARCHIVE_BATCH_PAUSE', '0.05'))
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_JSON = getenv_bool('LOG_JSON', False)
+# запись в stdout идёт из отдельного потока, чтобы медленный вывод не тормозил обработку запросов
+LOG_QUEUE = getenv_bool('LOG_QUEUE', True)
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+# доля запросов, чьи access- и SQL-логи пишутся; предупреждения и ошибки пишутся всегда
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv('ACCESS_LOG_SAMPLE_RATE', '1'))
+SQL_LOG_SAMPLE_RATE = float(os.getenv('SQL_LOG_SAMPLE_RATE', '1'))
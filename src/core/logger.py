@@ -1,9 +1,122 @@
-LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+import atexit
+import logging
+import queue
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging import config as logging_config
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+import orjson
+
+from src.core.config import (ACCESS_LOG_SAMPLE_RATE, DB_ECHO, LOG_JSON, LOG_LEVEL, LOG_QUEUE, LOG_QUEUE_SIZE,
+                             SQL_LOG_SAMPLE_RATE)
+from src.core.metrics import registry
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
 LOG_DEFAULT_HANDLERS = ['console', ]
+NO_REQUEST_ID = '-'
+
+request_id: ContextVar[str] = ContextVar('request_id', default=NO_REQUEST_ID)
+dropped_records = registry.counter('log_records_dropped_total', 'Записи лога, отброшенные при полной очереди')
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    # решение принимается по id запроса, поэтому все записи одного запроса пишутся или отбрасываются вместе
+    def __init__(self, prefix: str, rate: float) -> None:
+        super().__init__()
+        self.prefix = prefix
+        self.threshold = int(min(max(rate, 0.0), 1.0) * 10000)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.threshold >= 10000 or record.levelno >= logging.WARNING or not record.name.startswith(self.prefix):
+            return True
+        current = request_id.get()
+        if current == NO_REQUEST_ID:
+            return True
+        return zlib.crc32(current.encode()) % 10000 < self.threshold
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data: dict[str, Any] = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', NO_REQUEST_ID),
+        }
+        if record.name == 'uvicorn.access' and isinstance(record.args, tuple) and len(record.args) == 5:
+            client, method, path, version, status = record.args
+            data.update(client=client, method=method, path=path, http_version=version, status=status)
+        else:
+            data['message'] = record.getMessage()
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return orjson.dumps(data, default=str).decode()
+
+
+class TargetQueueHandler(QueueHandler):
+    # кладёт запись в общую очередь вместе с обработчиком, который её выведет;
+    # фильтры остаются на стороне вызывающего кода, чтобы id запроса брался из его контекста
+    def __init__(self, records: queue.Queue, target: logging.Handler) -> None:
+        super().__init__(records)
+        self.target = target
+        self.setLevel(target.level)
+        self.filters = target.filters
+        target.filters = []
+
+    def prepare(self, record: logging.LogRecord) -> Any:
+        # в пределах процесса запись не сериализуется: args нужны форматтеру access-лога uvicorn
+        return self.target, record
+
+    def enqueue(self, record: Any) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc()
+
+
+class TargetQueueListener(QueueListener):
+    def handle(self, record: Any) -> None:
+        target, record = record
+        if record.levelno >= target.level:
+            target.handle(record)
+
+
+def make_handler(formatter: str, stream: str, filters: tuple[str, ...] = ()) -> dict[str, Any]:
+    return {
+        'formatter': 'json' if LOG_JSON else formatter,
+        'class': 'logging.StreamHandler',
+        'stream': stream,
+        'filters': [*filters, 'request_id'],
+    }
+
 
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {
+            '()': RequestIdFilter,
+        },
+        'access_sampling': {
+            '()': SamplingFilter,
+            'prefix': 'uvicorn.access',
+            'rate': ACCESS_LOG_SAMPLE_RATE,
+        },
+        'sql_sampling': {
+            '()': SamplingFilter,
+            'prefix': 'sqlalchemy.engine',
+            'rate': SQL_LOG_SAMPLE_RATE,
+        },
+    },
     'formatters': {
         'verbose': {
             'format': LOG_FORMAT
@@ -15,44 +128,65 @@ LOGGING = {
         },
         'access': {
             '()': 'uvicorn.logging.AccessFormatter',
-            'fmt': '%(levelprefix)s %(client_addr)s - '
+            'fmt': '%(levelprefix)s [%(request_id)s] %(client_addr)s - '
                    '"%(request_line)s" %(status_code)s',
         },
+        'json': {
+            '()': JsonFormatter,
+        },
     },
     'handlers': {
         'console': {
             'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
-        },
-        'default': {
-            'formatter': 'default',
-            'class': 'logging.StreamHandler',
-            'stream': 'ext://sys.stdout',
-        },
-        'access': {
-            'formatter': 'access',
-            'class': 'logging.StreamHandler',
-            'stream': 'ext://sys.stdout',
+            **make_handler('verbose', 'ext://sys.stderr', ('sql_sampling',)),
         },
+        'default': make_handler('default', 'ext://sys.stdout'),
+        'access': make_handler('access', 'ext://sys.stdout', ('access_sampling',)),
     },
     'loggers': {
-        '': {
-            'handlers': LOG_DEFAULT_HANDLERS,
-            'level': 'INFO',
+        'uvicorn': {
+            'handlers': ['default'],
+            'level': LOG_LEVEL,
+            'propagate': False,
         },
         'uvicorn.error': {
-            'level': 'INFO',
+            'level': LOG_LEVEL,
         },
         'uvicorn.access': {
             'handlers': ['access'],
-            'level': 'INFO',
+            'level': LOG_LEVEL,
             'propagate': False,
         },
+        # вместо echo=True движка: SQL идёт через общие обработчики, очередь и семплирование
+        'sqlalchemy.engine': {
+            'level': 'INFO' if DB_ECHO else 'WARNING',
+        },
     },
     'root': {
-        'level': 'INFO',
-        'formatter': 'verbose',
+        'level': LOG_LEVEL,
         'handlers': LOG_DEFAULT_HANDLERS,
     },
 }
+
+
+def setup_logging() -> QueueListener | None:
+    logging_config.dictConfig(LOGGING)
+    if not LOG_QUEUE:
+        return None
+    records: queue.Queue = queue.Queue(LOG_QUEUE_SIZE)
+    replaced: dict[logging.Handler, logging.Handler] = {}
+    loggers = [logging.getLogger()] + [
+        logger for logger in logging.Logger.manager.loggerDict.values() if isinstance(logger, logging.Logger)
+    ]
+    for logger in loggers:
+        for handler in list(logger.handlers):
+            if isinstance(handler, QueueHandler):
+                continue
+            if handler not in replaced:
+                replaced[handler] = TargetQueueHandler(records, handler)
+            logger.removeHandler(handler)
+            logger.addHandler(replaced[handler])
+    listener = TargetQueueListener(records)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
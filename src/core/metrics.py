@@ -0,0 +1,207 @@
+import bisect
+import math
+import time
+from contextvars import ContextVar
+from typing import Callable, Iterator
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = '<unmatched>'
+
+# время по стадиям (decode, render, db, queue_wait) внутри текущего запроса
+request_stages: ContextVar[dict[str, float] | None] = ContextVar('request_stages', default=None)
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ''
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+
+    def collect(self) -> Iterator[str]:
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} {self.kind}'
+        yield from self.samples()
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, description, labels)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.values.items():
+            yield f'{self.name}{format_labels(self.labels, labels)} {format_value(value)}'
+
+
+class Gauge(Metric):
+    # значение снимается в момент запроса /metrics
+    kind = 'gauge'
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, description, labels)
+        self.callbacks: dict[tuple[str, ...], Callable[[], float]] = {}
+
+    def set_function(self, callback: Callable[[], float], *labels: str) -> None:
+        self.callbacks[labels] = callback
+
+    def samples(self) -> Iterator[str]:
+        for labels, callback in self.callbacks.items():
+            yield f'{self.name}{format_labels(self.labels, labels)} {format_value(callback())}'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        # по каждому набору меток: счётчики корзин (последняя - +Inf) и сумма
+        self.values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        state = self.values.get(labels)
+        if state is None:
+            state = self.values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = state
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def samples(self) -> Iterator[str]:
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{format_value(bound)}"'
+                yield f'{self.name}_bucket{format_labels(self.labels, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{format_labels(self.labels, labels)} {format_value(total[0])}'
+            yield f'{self.name}_count{format_labels(self.labels, labels)} {cumulative}'
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f'Метрика {metric.name} уже зарегистрирована')
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, description, labels))
+
+    def histogram(self, name: str, description: str, labels: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Время обработки запроса', ('method', 'route', 'status'))
+request_stage_duration = registry.histogram(
+    'http_request_stage_seconds', 'Время стадий внутри запроса', ('method', 'route', 'stage'))
+requests_in_progress = registry.gauge('http_requests_in_progress', 'Запросы в обработке')
+db_query_duration = registry.histogram('db_query_duration_seconds', 'Время выполнения SQL-запроса')
+executor_queue_wait = registry.histogram(
+    'executor_queue_wait_seconds', 'Ожидание свободного воркера и передача данных', ('executor',))
+executor_run_duration = registry.histogram('executor_run_seconds', 'Время работы задачи в воркере', ('executor',))
+executor_rejected = registry.counter('executor_rejected_total', 'Задачи, отклонённые из-за полной очереди',
+                                     ('executor',))
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    stages = request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+class MetricsMiddleware:
+    # меряет запрос целиком, включая отдачу потоковых ответов, и раскладывает время по стадиям
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.in_progress = 0
+        self.routes: dict[object, str] = {}
+        requests_in_progress.set_function(lambda: self.in_progress)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        stages: dict[str, float] = {}
+        token = request_stages.set(stages)
+        self.in_progress += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            self.in_progress -= 1
+            request_stages.reset(token)
+            method, route = scope['method'], self.get_route(scope)
+            request_duration.observe(duration, method, route, str(status))
+            for stage, seconds in stages.items():
+                request_stage_duration.observe(seconds, method, route, stage)
+
+    def get_route(self, scope: Scope) -> str:
+        # шаблон пути, а не сам путь, чтобы uuid в пути не раздували число рядов
+        endpoint = scope.get('endpoint')
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        route = self.routes.get(endpoint)
+        if route is None:
+            route = UNMATCHED_ROUTE
+            for candidate in getattr(scope.get('app'), 'routes', ()):
+                if getattr(candidate, 'endpoint', None) is endpoint:
+                    route = candidate.path
+                    break
+            self.routes[endpoint] = route
+        return route
@@ -0,0 +1,104 @@
+import uuid
+
+import orjson
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.logger import request_id
+
+# запас на заголовки частей и разделители multipart
+MULTIPART_OVERHEAD = 16 * 1024
+REQUEST_ID_HEADER = b'x-request-id'
+REQUEST_ID_MAX_LENGTH = 128
+
+
+class BodyTooLargeError(Exception):
+    pass
+
+
+class BodySizeLimitMiddleware:
+    # отклоняет тело больше max_size до того, как multipart-парсер сложит его во временный файл:
+    # сразу по Content-Length, а при chunked-передаче - по мере чтения
+    def __init__(self, app: ASGIApp, max_size: int, paths: tuple[str, ...]) -> None:
+        self.app = app
+        self.max_size = max_size + MULTIPART_OVERHEAD
+        self.paths = paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['method'] != 'POST' or not scope['path'].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+        for name, value in scope['headers']:
+            if name == b'content-length' and value.isdigit() and int(value) > self.max_size:
+                await self.reject(send)
+                return
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, too_large
+            message = await receive()
+            received += len(message.get('body', b''))
+            if received > self.max_size:
+                too_large = True
+                raise BodyTooLargeError
+            return message
+
+        async def limited_send(message: Message) -> None:
+            # FastAPI превращает ошибку чтения тела в 400, поэтому ответ подменяется на 413
+            nonlocal response_started
+            if too_large:
+                if message['type'] == 'http.response.start' and not response_started:
+                    response_started = True
+                    await self.reject(send)
+                return
+            response_started = response_started or message['type'] == 'http.response.start'
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except BodyTooLargeError:
+            if response_started:
+                raise
+            await self.reject(send)
+
+    @staticmethod
+    async def reject(send: Send) -> None:
+        body = orjson.dumps({'message': 'Файл слишком большой'})
+        await send({'type': 'http.response.start', 'status': 413,
+                    'headers': [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+class RequestIdMiddleware:
+    # id из заголовка X-Request-ID (или новый) попадает во все записи лога запроса и возвращается в ответе
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        value = self.get_request_id(scope)
+
+        async def send_with_id(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                message['headers'] = [*message.get('headers', ()), (REQUEST_ID_HEADER, value.encode())]
+            await send(message)
+
+        token = request_id.set(value)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
+
+    @staticmethod
+    def get_request_id(scope: Scope) -> str:
+        for name, value in scope['headers']:
+            if name == REQUEST_ID_HEADER:
+                if 0 < len(value) <= REQUEST_ID_MAX_LENGTH and value.isascii() and value.decode().isprintable():
+                    return value.decode()
+                break
+        return uuid.uuid4().hex
@@ -1,16 +1,127 @@
-from typing import AsyncGenerator
+import time
+from contextlib import AsyncExitStack
+from typing import Any, AsyncGenerator
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
-from src.core.config import DSN
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from src.core.config import (DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_POOL_SIZE, DB_POOL_TIMEOUT,
+                             DB_READ_POOL_SIZE, DSN, DSN_READ, SQLITE_BUSY_TIMEOUT, SQLITE_JOURNAL_MODE,
+                             SQLITE_READ_POOL, SQLITE_SYNCHRONOUS)
+from src.core.metrics import db_query_duration, observe_stage, registry
 
-engine = create_async_engine(DSN, echo=True)
+pool_connections = registry.gauge('db_pool_connections', 'Соединения пула по состоянию', ('engine', 'state'))
+pool_size = registry.gauge('db_pool_size', 'Постоянный размер пула', ('engine',))
+
+
+def make_engine(dsn: str, pool_size: int = DB_POOL_SIZE, read_only: bool = False) -> AsyncEngine:
+    url = make_url(dsn)
+    # SQL пишется в лог через логгер sqlalchemy.engine (DB_ECHO в src/core/logger.py), а не echo движка
+    options: dict[str, Any] = dict(pool_pre_ping=DB_POOL_PRE_PING)
+    is_sqlite = url.get_backend_name() == 'sqlite'
+    if not is_sqlite or url.database not in (None, '', ':memory:'):
+        # aiosqlite по умолчанию открывает новое соединение на каждую сессию (NullPool)
+        options.update(pool_size=pool_size, max_overflow=DB_MAX_OVERFLOW,
+                       pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE)
+        if is_sqlite:
+            options['poolclass'] = AsyncAdaptedQueuePool
+    if url.get_driver_name() == 'asyncpg':
+        # время хранится с часовым поясом, а день отметки в SQL (отчёты) должен совпадать с днём по UTC
+        options['connect_args'] = {'server_settings': {'timezone': 'UTC'}}
+    new_engine = create_async_engine(url, **options)
+    if is_sqlite:
+        event.listen(new_engine.sync_engine, 'connect', set_sqlite_pragmas)
+        if read_only:
+            event.listen(new_engine.sync_engine, 'connect', set_sqlite_query_only)
+    event.listen(new_engine.sync_engine, 'before_cursor_execute', start_query_timer)
+    event.listen(new_engine.sync_engine, 'after_cursor_execute', stop_query_timer)
+    return new_engine
+
+
+def start_query_timer(connection: Any, cursor: Any, statement: str, parameters: Any, context: Any,
+                      executemany: bool) -> None:
+    # на соединении одновременно выполняется один запрос; после ошибки after_cursor_execute не вызывается,
+    # и значение просто перезапишется следующим запросом
+    connection.info['query_start'] = time.perf_counter()
+
+
+def stop_query_timer(connection: Any, cursor: Any, statement: str, parameters: Any, context: Any,
+                     executemany: bool) -> None:
+    duration = time.perf_counter() - connection.info.pop('query_start')
+    db_query_duration.observe(duration)
+    observe_stage('db', duration)
+
+
+def instrument_pool(name: str, instrumented: AsyncEngine) -> None:
+    # NullPool и StaticPool не считают соединения, для них метрики пула не нужны
+    pool = instrumented.pool
+    if not hasattr(pool, 'checkedout'):
+        return
+    pool_connections.set_function(pool.checkedout, name, 'checked_out')
+    pool_connections.set_function(pool.checkedin, name, 'idle')
+    pool_connections.set_function(lambda: max(pool.overflow(), 0), name, 'overflow')
+    pool_size.set_function(pool.size, name)
+
+
+def set_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE}')
+    cursor.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}')
+    # без этого SQLite не проверяет внешние ключи и не удаляет по ON DELETE CASCADE отметки и счётчики купона
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+def set_sqlite_query_only(dbapi_connection: Any, connection_record: Any) -> None:
+    # попытка записи через пул чтения завершится ошибкой, а не пройдёт мимо основного пула
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA query_only=ON')
+    cursor.close()
+
+
+def make_read_engine() -> AsyncEngine:
+    if DSN_READ:
+        return make_engine(DSN_READ, DB_READ_POOL_SIZE, read_only=True)
+    if SQLITE_READ_POOL and engine.dialect.name == 'sqlite':
+        return make_engine(DSN, DB_READ_POOL_SIZE, read_only=True)
+    return engine
+
+
+engine = make_engine(DSN)
+instrument_pool('primary', engine)
 async_session = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
+read_engine = make_read_engine()
+if read_engine is not engine:
+    instrument_pool('read', read_engine)
+async_read_session = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
 Base = declarative_base()
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         yield session
+
+
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    # только для чтения: реплика может отставать от основной БД
+    async with async_read_session() as session:
+        yield session
+
+
+async def warm_up_pool(connections: int) -> None:
+    # соединения открываются при старте воркера, а не на первых запросах
+    pools = [(engine, DB_POOL_SIZE)]
+    if read_engine is not engine:
+        pools.append((read_engine, DB_READ_POOL_SIZE))
+    async with AsyncExitStack() as stack:
+        for warmed, size in pools:
+            for _ in range(min(connections, size)):
+                connection = await stack.enter_async_context(warmed.connect())
+                await connection.execute(text('SELECT 1'))
@@ -1,25 +1,79 @@
-from logging import config as logging_config
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator
 
 import uvicorn
 from fastapi import FastAPI
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 
 from src.api.v1 import base
 from src.core import config
-from src.core.logger import LOGGING
+from src.core.logger import setup_logging
+from src.core.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from src.core.middleware import BodySizeLimitMiddleware, RequestIdMiddleware
+from src.db.database import async_session, warm_up_pool
+from src.services.archive import run_archiver
+from src.services.base import meal_batcher
+from src.services.executor import decode_executor, render_executor
+from src.services.index import ticket_index
+from src.services.prerender import qr_prerenderer
+from src.services.qr import warm_up_decoder
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # выполняется в каждом воркере uvicorn отдельно; пулы декодера и рендера запускаются первой задачей
+    await warm_up_pool(config.WARMUP_DB_CONNECTIONS)
+    if config.WARMUP_DECODER:
+        workers = await decode_executor.warm_up(warm_up_decoder)
+        logger.info('Декодер QR прогрет в %s воркерах', len(workers))
+    async with async_session() as session:
+        await ticket_index.warm(session)
+    archiver = asyncio.create_task(run_archiver()) if config.ARCHIVE_AFTER_DAYS > 0 else None
+    meal_batcher.start()
+    qr_prerenderer.start()
+    yield
+    await qr_prerenderer.stop()
+    await meal_batcher.stop()
+    if archiver is not None:
+        archiver.cancel()
+        with suppress(asyncio.CancelledError):
+            await archiver
+    render_executor.shutdown()
+    decode_executor.shutdown()
+
 
-logging_config.dictConfig(LOGGING)
 app = FastAPI(
     title=config.PROJECT_NAME,
     docs_url='/api/openapi',
     openapi_url='/api/openapi.json',
     default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 app.include_router(base.router, prefix='/api/v1')
+app.add_middleware(BodySizeLimitMiddleware, max_size=config.MAX_IMAGE_SIZE, paths=('/api/v1/meals',))
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
 
 if __name__ == '__main__':
     uvicorn.run(
         'src.main:app',
         host=config.PROJECT_HOST,
         port=config.PROJECT_PORT,
+        workers=config.WORKERS,
+        # при RELOAD uvicorn перезапускает единственный воркер при изменении кода, WORKERS игнорируется
+        reload=config.RELOAD,
+        timeout_graceful_shutdown=config.GRACEFUL_TIMEOUT,
+        # логирование уже настроено setup_logging, uvicorn не должен перенастраивать его своим конфигом
+        log_config=None,
     )
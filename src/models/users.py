@@ -1,9 +1,10 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Uuid
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Index, Integer, String, Uuid
 from sqlalchemy.orm import relationship
 
 from src.db.database import Base
 
 NAME_MAX_LENGTH = 250
+CLIENT_ID_MAX_LENGTH = 64
 
 
 class User(Base):
@@ -16,18 +17,54 @@ class User(Base):
 class Ticket(Base):
     __tablename__ = 'tickets'
     uuid = Column(Uuid, primary_key=True)
-    created = Column(DateTime)
-    user_uuid = Column(Integer,
+    created = Column(DateTime(timezone=True))
+    user_uuid = Column(Uuid,
                        ForeignKey('users.uuid', ondelete='CASCADE'),
                        nullable=False, unique=True)
     user = relationship(User, back_populates='ticket')
-    meals = relationship('Meal', back_populates='ticket', lazy='joined')
+    meals = relationship('Meal', back_populates='ticket', passive_deletes=True)
 
 
 class Meal(Base):
     __tablename__ = 'meals'
+    __table_args__ = (
+        Index('ix_meals_ticket_uuid_time', 'ticket_uuid', 'time'),
+        # id не переиспользуются в SQLite: по ним отметки переносятся в meals_archive
+        {'sqlite_autoincrement': True},
+    )
     id = Column(Integer, primary_key=True, index=True)
-    ticket_uuid = Column(Integer,
-                         ForeignKey('tickets.uuid'), nullable=False)
+    ticket_uuid = Column(Uuid,
+                         ForeignKey('tickets.uuid', ondelete='CASCADE'), nullable=False)
     ticket = relationship(Ticket, back_populates='meals')
-    time = Column(DateTime)
+    time = Column(DateTime(timezone=True), index=True)
+    client_id = Column(String(length=CLIENT_ID_MAX_LENGTH), index=True, unique=True)
+
+
+class MealCounter(Base):
+    __tablename__ = 'meal_counters'
+    ticket_uuid = Column(Uuid,
+                         ForeignKey('tickets.uuid', ondelete='CASCADE'), primary_key=True)
+    # по дню строятся отчёты за период: итоги дня считаются при запросе, а не ведутся общей строкой,
+    # которую каждая отметка блокировала бы до конца своей транзакции
+    day = Column(Date, primary_key=True, index=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class MealMonthlyCounter(Base):
+    # приёмы пищи и дни с приёмами пищи по купону за месяц (month - первое число месяца);
+    # без внешнего ключа, чтобы отчёты за прошлые месяцы переживали удаление купона
+    __tablename__ = 'meal_monthly_counters'
+    month = Column(Date, primary_key=True)
+    ticket_uuid = Column(Uuid, primary_key=True)
+    meals = Column(Integer, nullable=False, default=0)
+    days = Column(Integer, nullable=False, default=0)
+
+
+class MealArchive(Base):
+    # отметки старше ARCHIVE_AFTER_DAYS, перенесённые из meals; id сохраняется, внешнего ключа нет,
+    # чтобы архив не мешал удалять купоны и не замедлял вставки в meals
+    __tablename__ = 'meals_archive'
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    ticket_uuid = Column(Uuid, nullable=False)
+    time = Column(DateTime(timezone=True), index=True)
+    client_id = Column(String(length=CLIENT_ID_MAX_LENGTH), index=True)
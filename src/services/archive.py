@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import delete, select
+
+from src.core.config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_PAUSE, ARCHIVE_BATCH_SIZE, ARCHIVE_INTERVAL
+from src.db.database import async_session
+from src.models.users import Meal, MealArchive
+from src.services.base import get_insert
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = ('id', 'ticket_uuid', 'time', 'client_id')
+
+
+def get_archive_day(days: int = ARCHIVE_AFTER_DAYS) -> date:
+    return datetime.now(timezone.utc).date() - timedelta(days=days)
+
+
+async def archive_meals(before: date, session: AsyncSession, batch_size: int = ARCHIVE_BATCH_SIZE,
+                        pause: float = ARCHIVE_BATCH_PAUSE) -> int:
+    # отметки раньше дня before переносятся пачками, каждая в своей короткой транзакции,
+    # чтобы не держать блокировку meals во время обеда; итоги для отчётов при этом не меняются.
+    # Счётчики за день остаются: по ним /meals/sync проверяет лимит и для старых дней
+    cutoff = datetime.combine(before, time.min, timezone.utc)
+    moved = 0
+    while True:
+        ids = (await session.scalars(
+            select(Meal.id).where(Meal.time < cutoff).order_by(Meal.time).limit(batch_size)
+        )).all()
+        if not ids:
+            break
+        # при нескольких воркерах одна и та же пачка может переноситься дважды, повтор пропускается;
+        # id в meals не переиспользуются, поэтому совпадение id - это та же самая отметка
+        statement = get_insert(session)(MealArchive).from_select(
+            ARCHIVE_COLUMNS, select(*(getattr(Meal, column) for column in ARCHIVE_COLUMNS)).where(Meal.id.in_(ids))
+        ).on_conflict_do_nothing()
+        await session.execute(statement)
+        await session.execute(delete(Meal).where(Meal.id.in_(ids)))
+        await session.commit()
+        moved += len(ids)
+        await asyncio.sleep(pause)
+    return moved
+
+
+async def run_archiver() -> None:
+    while True:
+        try:
+            async with async_session() as session:
+                moved = await archive_meals(get_archive_day(), session)
+            if moved:
+                logger.info('В архив перенесено отметок о приёме пищи: %s', moved)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception('Не удалось перенести отметки о приёме пищи в архив')
+        await asyncio.sleep(ARCHIVE_INTERVAL)
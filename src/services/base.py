@@ -1,22 +1,56 @@
+import asyncio
+import csv
 import io
-from typing import Any
-from datetime import datetime, timezone
+from collections import deque
+from typing import Any, AsyncIterator, Callable
+from datetime import date, datetime, timedelta, timezone
 from uuid import UUID, uuid4
 
-from aioshutil import copyfileobj
 from fastapi import Response, UploadFile, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql.expression import delete, insert, join, select
+from sqlalchemy import Column, Date, DateTime, Insert, Select, Uuid, literal, tuple_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql.expression import delete, insert, select, update
 
-from src.api.v1.schemas import MealIn, TicketUUID, UserUUID
-from src.core.config import MEALS_LIMIT
-from src.db.database import Base
-from src.models.users import Meal, Ticket, User
-from src.services.qr import decode, get_image
-from src.services.utils import is_valid_uuid, make_response_message
+from src.api.v1.schemas import CheckInIn, CheckInStatus, MealIn, MealSyncIn, TicketUUID, UserUUID
+from src.core.config import (BULK_INSERT_CHUNK, BULK_RENDER_CHUNK, MAX_IMAGE_SIZE, MEAL_WRITE_BATCH_DELAY_MS,
+                             MEAL_WRITE_BATCH_SIZE, MEAL_WRITE_BATCHING, MEALS_LIMIT, QR_PRERENDER_WAIT_TIMEOUT,
+                             SYNC_MAX_AGE_DAYS, SYNC_MAX_CLOCK_SKEW)
+from src.db.database import Base, async_read_session, async_session, engine
+from src.models.users import Meal, MealArchive, MealCounter, MealMonthlyCounter, Ticket, User
+from src.services.batcher import MealWriteBatcher
+from src.services.cache import make_cache_key, qr_cache
+from src.services.executor import ExecutorBusyError, decode_executor, render_executor
+from src.services.index import ticket_index
+from src.services.prerender import qr_prerenderer
+from src.services.qr import MEDIA_TYPES, decode, decode_all, get_images, get_render_params, render
+from src.services.signing import PayloadRejected, qr_signer
+from src.services.upload import open_upload
+from src.services.utils import (as_utc, decode_cursor, dump_rows, dump_rows_ndjson, encode_cursor, etag_matches,
+                                iter_zip, make_response_message, meal_day)
 
 ITEMS_LIMIT = 1000
+NDJSON_CHUNK_ROWS = 500
+# тексты нарушения уникальности tickets.user_uuid в SQLite и PostgreSQL
+TICKET_USER_CONSTRAINTS = ('tickets.user_uuid', 'tickets_user_uuid_key')
+SYNC_ATTEMPTS = 2
+
+LIST_COLUMNS = {
+    Ticket: (Ticket.uuid, Ticket.created, Ticket.user_uuid),
+    Meal: (Meal.id, Meal.ticket_uuid, Meal.time),
+}
+LIST_ORDER = {
+    Ticket: (Ticket.created, Ticket.uuid),
+    Meal: (Meal.id,),
+}
+# ключи JSON и позиции колонок курсора в строке считаются один раз, а не на каждый запрос
+LIST_KEYS = {model: tuple(column.key for column in columns) for model, columns in LIST_COLUMNS.items()}
+LIST_CURSOR_POSITIONS = {
+    model: tuple(LIST_COLUMNS[model].index(column) for column in order) for model, order in LIST_ORDER.items()
+}
 
 
 async def create_user(name: str, session: AsyncSession) -> dict[str, str]:
@@ -34,9 +68,14 @@ async def user_delete(user: UserUUID, session: AsyncSession) -> Response:
     is_exists = await is_uuid_exists(user.uuid, User, session)
     if not is_exists:
         return Response(status_code=status.HTTP_404_NOT_FOUND)
+    statement = select(Ticket.uuid).where(Ticket.user_uuid == user.uuid)
+    tickets = (await session.execute(statement)).scalars().all()
     statement = delete(User).where(User.uuid == user.uuid)
     await session.execute(statement)
     await session.commit()
+    for ticket_uuid in tickets:
+        ticket_index.remove(ticket_uuid)
+        qr_signer.revoke(ticket_uuid)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -47,23 +86,88 @@ async def create_ticket(user: UserUUID, session: AsyncSession) -> dict[str, Any]
 
     ticket_uuid = uuid4()
     created = datetime.now(timezone.utc)
-    ticket = [dict(uuid=ticket_uuid, created=created, user_uuid=user.uuid.hex)]
+    ticket = [dict(uuid=ticket_uuid, created=created, user_uuid=user.uuid)]
     statement = insert(Ticket).values(ticket)
     try:
         await session.execute(statement)
     except IntegrityError as error:
-        if 'UNIQUE constraint failed: tickets.user_uuid' not in str(error):
+        if not any(constraint in str(error) for constraint in TICKET_USER_CONSTRAINTS):
             raise
         return Response(status_code=status.HTTP_409_CONFLICT,
                         content=make_response_message('У пользователя уже есть купон'),
                         media_type='application/json')
 
     await session.commit()
+    ticket_index.add(ticket_uuid, user.uuid)
+    qr_prerenderer.submit([ticket_uuid])
     return {'uuid': ticket_uuid, 'created': created, 'user_uuid': user.uuid}
 
 
-async def retrieve_tickets(session: AsyncSession) -> list[dict[str, Any]]:
-    return await retrieve_model_items(Ticket, session)
+async def create_tickets_bulk(names: list[str], session: AsyncSession, fmt: str = 'png') -> StreamingResponse:
+    created = datetime.now(timezone.utc)
+    users = [dict(uuid=uuid4(), name=name) for name in names]
+    tickets = [dict(uuid=uuid4(), created=created, user_uuid=user['uuid']) for user in users]
+    for start in range(0, len(users), BULK_INSERT_CHUNK):
+        await session.execute(insert(User).values(users[start:start + BULK_INSERT_CHUNK]))
+        await session.execute(insert(Ticket).values(tickets[start:start + BULK_INSERT_CHUNK]))
+    await session.commit()
+    ticket_index.add_many((ticket['uuid'], user['uuid']) for user, ticket in zip(users, tickets))
+    # формат архива рисуется при его выдаче, в фоне - только остальные
+    qr_prerenderer.submit((ticket['uuid'] for ticket in tickets), rendered=fmt)
+
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(('name', 'user_uuid', 'ticket_uuid'))
+    writer.writerows((user['name'], user['uuid'], ticket['uuid']) for user, ticket in zip(users, tickets))
+
+    async def iter_files() -> AsyncIterator[tuple[str, bytes]]:
+        yield 'tickets.csv', manifest.getvalue().encode()
+        extension = 'svg' if fmt == 'svg' else 'png'
+        async for ticket_uuid, content in iter_qr_images([str(ticket['uuid']) for ticket in tickets], fmt):
+            yield f'{ticket_uuid}.{extension}', content
+
+    return StreamingResponse(iter_zip(iter_files()), status_code=status.HTTP_201_CREATED, media_type='application/zip',
+                             headers={'Content-Disposition': 'attachment; filename="tickets.zip"'})
+
+
+async def iter_qr_images(uuids: list[str], fmt: str) -> AsyncIterator[tuple[str, bytes]]:
+    # пачки рендерятся параллельно, но в архив попадают в исходном порядке;
+    # одновременно в пуле не больше пачек, чем в нём воркеров
+    chunks = [uuids[start:start + BULK_RENDER_CHUNK] for start in range(0, len(uuids), BULK_RENDER_CHUNK)]
+    pending: deque[asyncio.Future] = deque()
+    try:
+        for chunk in chunks:
+            pending.append(asyncio.ensure_future(render_qr_chunk(chunk, fmt)))
+            if len(pending) < render_executor.workers:
+                continue
+            for item in await pending.popleft():
+                yield item
+        while pending:
+            for item in await pending.popleft():
+                yield item
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def render_qr_chunk(uuids: list[str], fmt: str) -> list[tuple[str, bytes]]:
+    # в ключе кэша - сами данные QR-кода, т.е. с номером ключа подписи и окном действия
+    params = get_render_params(fmt)
+    payloads = [qr_signer.issue(UUID(item)) for item in uuids]
+    keys = [make_cache_key(item, params) for item in payloads]
+    images = await qr_cache.load_many(keys)
+    missing = [index for index, content in enumerate(images) if content is None]
+    if missing:
+        rendered = await render_executor.run_when_free(get_images, [payloads[index] for index in missing], fmt)
+        for index, content in zip(missing, rendered):
+            images[index] = content
+        await qr_cache.store_many([(keys[index], images[index]) for index in missing])
+    return list(zip(uuids, images))
+
+
+async def retrieve_tickets(session: AsyncSession, cursor: str | None = None, limit: int | None = None,
+                           fmt: str = 'json') -> Response:
+    return await retrieve_model_items(Ticket, session, cursor, limit, fmt)
 
 
 async def ticket_delete(ticket: TicketUUID, session: AsyncSession) -> Response:
@@ -74,6 +178,8 @@ async def ticket_delete(ticket: TicketUUID, session: AsyncSession) -> Response:
     statement = delete(Ticket).where(Ticket.uuid == ticket.uuid)
     await session.execute(statement)
     await session.commit()
+    ticket_index.remove(ticket.uuid)
+    qr_signer.revoke(ticket.uuid)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -85,70 +191,381 @@ async def is_uuid_exists(instance_uuid: UUID, model: Base, session: AsyncSession
     return True
 
 
-async def create_qr(ticket: TicketUUID, session: AsyncSession) -> Response:
-    is_exists = is_uuid_exists(ticket.uuid, Ticket, session)
+async def create_qr(ticket: TicketUUID, session: AsyncSession, fmt: str = 'png',
+                    if_none_match: str | None = None) -> Response:
+    is_exists = await is_uuid_exists(ticket.uuid, Ticket, session)
+    if not is_exists and session.bind is not engine:
+        # только что выпущенный купон мог ещё не дойти до реплики
+        async with async_session() as primary_session:
+            is_exists = await is_uuid_exists(ticket.uuid, Ticket, primary_session)
     if not is_exists:
         return Response(status_code=status.HTTP_404_NOT_FOUND)
-    try:
-        img = get_image(str(ticket.uuid))
-    except IndexError:
-        return Response(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                        content=make_response_message('Не удалось создать QR-код на основе полученных данных'),
-                        media_type='application/json')
-    file = io.BytesIO()
-    img.save(file, 'png')
-    return Response(content=file.getvalue(), media_type="image/png")
+    payload = qr_signer.issue(ticket.uuid)
+    key = make_cache_key(payload, get_render_params(fmt))
+    headers = {'ETag': f'"{key}"'}
+    if etag_matches(if_none_match, headers['ETag']):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    content = await qr_cache.load(key) or await qr_prerenderer.wait(key, QR_PRERENDER_WAIT_TIMEOUT)
+    if content is None:
+        try:
+            content = await render_executor.run(render, payload, fmt)
+        except ExecutorBusyError:
+            return make_busy_response()
+        except IndexError:
+            return Response(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            content=make_response_message('Не удалось создать QR-код на основе полученных данных'),
+                            media_type='application/json')
+        await qr_cache.store(key, content)
+    return Response(content=content, media_type=MEDIA_TYPES[fmt], headers=headers)
 
 
-async def create_meal(file: UploadFile, session: AsyncSession) -> Response:
+def check_upload(file: UploadFile) -> Response | None:
     if not file.size:
         return Response(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                         content=make_response_message('Файл отсутствует или пустой'),
                         media_type='application/json')
-    buffer = io.BytesIO()
-    await copyfileobj(file.file, buffer)
-    buffer.seek(0)
-    data = decode(buffer)
-    if not is_valid_uuid(data):
+    if file.size > MAX_IMAGE_SIZE:
+        return Response(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        content=make_response_message('Файл слишком большой'),
+                        media_type='application/json')
+    return None
+
+
+async def create_meal(file: UploadFile, session: AsyncSession) -> Response:
+    error = check_upload(file)
+    if error is not None:
+        return error
+    try:
+        with open_upload(file) as buffer:
+            data, decode_path = await decode_executor.run(decode, decode_executor.transferable(buffer))
+    except ExecutorBusyError:
+        return make_busy_response()
+    # путь распознавания отдаётся при любом исходе, в том числе когда код не прочитан
+    headers = {'X-Decode-Path': decode_path}
+    # подпись, срок действия и отзыв проверяются до обращения к БД
+    try:
+        ticket_uuid = qr_signer.verify(data)
+    except PayloadRejected as error:
+        return Response(status_code=status.HTTP_403_FORBIDDEN, content=make_response_message(error.message),
+                        media_type='application/json', headers=headers)
+    if ticket_uuid is None:
+        return make_check_in_response(CheckInStatus.invalid, headers)
+    result, = await check_in_tickets([ticket_uuid], session)
+    return make_check_in_response(result, headers)
+
+
+async def create_group_meal(file: UploadFile, session: AsyncSession) -> dict[str, Any] | Response:
+    # все коды с одного снимка: одно распознавание, один запрос на проверку купонов и одна транзакция
+    error = check_upload(file)
+    if error is not None:
+        return error
+    try:
+        with open_upload(file) as buffer:
+            decoded = await decode_executor.run(decode_all, decode_executor.transferable(buffer))
+    except ExecutorBusyError:
+        return make_busy_response()
+    if not decoded.data:
         return Response(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                        content=make_response_message('Информация на QR-коде не является UUID'),
+                        content=make_response_message('На изображении не найдено ни одного распознанного QR-кода'),
                         media_type='application/json')
-    ticket_uuid = UUID(data)
+    results = []
+    pending: dict[UUID, dict[str, Any]] = {}
+    for data in decoded.data:
+        result = {'data': data, 'uuid': None, 'status': CheckInStatus.invalid}
+        results.append(result)
+        try:
+            result['uuid'] = ticket_uuid = qr_signer.verify(data)
+        except PayloadRejected:
+            result['status'] = CheckInStatus.rejected
+            continue
+        if ticket_uuid is None:
+            continue
+        if ticket_uuid in pending:
+            result['status'] = CheckInStatus.duplicate
+            continue
+        result['status'] = CheckInStatus.not_found
+        pending[ticket_uuid] = result
+    if pending:
+        statement = select(Ticket.uuid).where(Ticket.uuid.in_(pending))
+        known = list((await session.execute(statement)).scalars())
+        for ticket_uuid, check_in_status in zip(known, await check_in_tickets(known, session)):
+            pending[ticket_uuid]['status'] = check_in_status
+    return {'results': results, 'undecoded': decoded.undecoded}
 
-    ticket_join_meals = join(Ticket, Meal, Ticket.uuid == Meal.ticket_uuid, isouter=True)
-    statement = select(Ticket, Meal).select_from(ticket_join_meals).where(Ticket.uuid == ticket_uuid)
-    result = await session.execute(statement)
-    ticket = result.scalar()
-    if ticket is None:
+
+async def create_meals_by_uuid(tickets: CheckInIn | list[CheckInIn],
+                               session: AsyncSession) -> Response | list[dict[str, Any]]:
+    if isinstance(tickets, CheckInIn):
+        verified = verify_ticket(tickets.uuid, tickets.data)
+        if isinstance(verified, CheckInStatus):
+            return make_check_in_response(verified)
+        result, = await check_in_tickets([verified], session)
+        return make_check_in_response(result)
+    verified = [verify_ticket(ticket.uuid, ticket.data) for ticket in tickets]
+    known = [ticket_uuid for ticket_uuid in verified if isinstance(ticket_uuid, UUID)]
+    results = iter(await check_in_tickets(known, session) if known else [])
+    return [{'uuid': None, 'status': ticket_uuid} if isinstance(ticket_uuid, CheckInStatus)
+            else {'uuid': ticket_uuid, 'status': next(results)} for ticket_uuid in verified]
+
+
+def verify_ticket(ticket_uuid: UUID | None, data: str | None, today: date | None = None) -> UUID | CheckInStatus:
+    # содержимое кода от сканера проверяется так же, как код со снимка в POST /meals, а голый uuid -
+    # по правилам для кодов без подписи; вместо uuid купона возвращается статус отказа
+    try:
+        if data is None:
+            return qr_signer.check_unsigned(ticket_uuid)
+        return qr_signer.verify(data, today) or CheckInStatus.invalid
+    except PayloadRejected:
+        return CheckInStatus.rejected
+
+
+async def check_in_tickets(ticket_uuids: list[UUID], session: AsyncSession,
+                           time: datetime | None = None) -> list[CheckInStatus]:
+    # все отметки пачки записываются одной транзакцией; при MEAL_WRITE_BATCHING
+    # в эту транзакцию попадают и отметки из параллельных запросов
+    time = time or datetime.now(tz=timezone.utc)
+    if meal_batcher.running:
+        return await meal_batcher.submit(ticket_uuids, time)
+    results = await apply_check_ins(ticket_uuids, session, time)
+    if CheckInStatus.created not in results:
+        await session.rollback()
+        return results
+    await session.commit()
+    record_check_ins(ticket_uuids, results, time)
+    return results
+
+
+async def apply_check_ins(ticket_uuids: list[UUID], session: AsyncSession, time: datetime) -> list[CheckInStatus]:
+    # индекс купонов отсекает неизвестные и исчерпанные купоны до обращения к БД
+    results = []
+    for ticket_uuid in ticket_uuids:
+        result = ticket_index.check(ticket_uuid)
+        if result is None:
+            result = await check_in(ticket_uuid, session, time)
+        results.append(result)
+    return results
+
+
+def record_check_ins(ticket_uuids: list[UUID], results: list[CheckInStatus], time: datetime) -> None:
+    # вызывается после коммита
+    day = meal_day(time)
+    for ticket_uuid, result in zip(ticket_uuids, results):
+        if result == CheckInStatus.created:
+            ticket_index.record_meal(ticket_uuid, day)
+
+
+meal_batcher = MealWriteBatcher(MEAL_WRITE_BATCHING, MEAL_WRITE_BATCH_SIZE, MEAL_WRITE_BATCH_DELAY_MS / 1000,
+                                apply_check_ins, record_check_ins)
+
+
+async def sync_meals(records: list[MealSyncIn], session: AsyncSession) -> list[dict[str, Any]]:
+    # повторная отправка пачки безопасна: записи с уже известным client_id не применяются;
+    # лимит проверяется по дню из времени сканирования, записи применяются в хронологическом порядке;
+    # срок действия QR-кода тоже проверяется на день сканирования
+    now = datetime.now(timezone.utc)
+    skew = timedelta(seconds=SYNC_MAX_CLOCK_SKEW)
+    earliest, latest = now - timedelta(days=SYNC_MAX_AGE_DAYS), now + skew
+    verified = [
+        verify_ticket(record.ticket_uuid, record.data, meal_day(as_utc(record.time)))
+        if earliest <= as_utc(record.time) <= latest else CheckInStatus.invalid
+        for record in records
+    ]
+    # отметка не может быть раньше выпуска купона
+    known = {ticket_uuid for ticket_uuid in verified if isinstance(ticket_uuid, UUID)}
+    issued = dict((await session.execute(select(Ticket.uuid, Ticket.created).where(Ticket.uuid.in_(known)))).all())
+    for position, record in enumerate(records):
+        created = issued.get(verified[position])
+        if created is not None and as_utc(record.time) < as_utc(created) - skew:
+            verified[position] = CheckInStatus.invalid
+    for attempt in range(SYNC_ATTEMPTS):
+        results: dict[int, CheckInStatus] = {}
+        first_seen: dict[str, int] = {}
+        for position, record in enumerate(records):
+            if record.client_id in first_seen:
+                results[position] = CheckInStatus.duplicate
+            else:
+                first_seen[record.client_id] = position
+        # запись могла уже уйти в архив (и на время переноса оказаться в обеих таблицах)
+        statement = select(Meal.client_id).where(Meal.client_id.in_(first_seen)).union_all(
+            select(MealArchive.client_id).where(MealArchive.client_id.in_(first_seen))
+        )
+        for client_id in set((await session.execute(statement)).scalars()):
+            results[first_seen.pop(client_id)] = CheckInStatus.duplicate
+
+        pending = sorted(first_seen.values(), key=lambda position: as_utc(records[position].time))
+        try:
+            for position in pending:
+                record, ticket_uuid = records[position], verified[position]
+                if isinstance(ticket_uuid, CheckInStatus):
+                    results[position] = ticket_uuid
+                    continue
+                if ticket_index.ready and ticket_uuid not in ticket_index:
+                    results[position] = CheckInStatus.not_found
+                    continue
+                results[position] = await check_in(ticket_uuid, session, as_utc(record.time), record.client_id)
+            await session.commit()
+        except IntegrityError:
+            # ту же пачку параллельно применил другой запрос: повторяем, уже видя его записи
+            await session.rollback()
+            if attempt == SYNC_ATTEMPTS - 1:
+                raise
+            continue
+        break
+
+    for position in pending:
+        if results[position] == CheckInStatus.created:
+            ticket_index.record_meal(verified[position], meal_day(as_utc(records[position].time)))
+    return [{'client_id': record.client_id,
+             'ticket_uuid': None if isinstance(verified[position], CheckInStatus) else verified[position],
+             'status': results[position]}
+            for position, record in enumerate(records)]
+
+
+async def check_in(ticket_uuid: UUID, session: AsyncSession, time: datetime | None = None,
+                   client_id: str | None = None) -> CheckInStatus:
+    # счётчик за день увеличивается одним условным upsert'ом: строка возвращается,
+    # только если купон существует и лимит ещё не исчерпан
+    time = time or datetime.now(tz=timezone.utc)
+    day = meal_day(time)
+    source = (
+        select(literal(ticket_uuid, Uuid), literal(day, Date), literal(1))
+        .where(Ticket.uuid == ticket_uuid)
+    )
+    statement = get_insert(session)(MealCounter).from_select(['ticket_uuid', 'day', 'count'], source)
+    statement = statement.on_conflict_do_update(
+        index_elements=[MealCounter.ticket_uuid, MealCounter.day],
+        set_={'count': MealCounter.count + 1},
+        where=MealCounter.count < MEALS_LIMIT,
+    ).returning(MealCounter.count)
+    count = (await session.execute(statement)).scalar()
+    if count is None:
+        if await is_uuid_exists(ticket_uuid, Ticket, session):
+            return CheckInStatus.limit_reached
+        return CheckInStatus.not_found
+    meal = [dict(ticket_uuid=ticket_uuid, time=time, client_id=client_id)]
+    await session.execute(insert(Meal).values(meal))
+    await update_rollups(ticket_uuid, day, 1, int(count == 1), session)
+    return CheckInStatus.created
+
+
+async def update_rollups(ticket_uuid: UUID, day: date, meals: int, days: int, session: AsyncSession) -> None:
+    # месячный итог купона меняется в той же транзакции, что и его счётчик за день; строка своя у каждого
+    # купона, так что параллельные отметки по разным купонам не ждут друг друга. Итоги дня считаются
+    # в отчёте из meal_counters. days - ±1, когда это первый приём пищи купона за день или отменяется последний
+    statement = get_insert(session)(MealMonthlyCounter).values(month=day.replace(day=1), ticket_uuid=ticket_uuid,
+                                                               meals=meals, days=days)
+    statement = statement.on_conflict_do_update(
+        index_elements=[MealMonthlyCounter.month, MealMonthlyCounter.ticket_uuid],
+        set_={'meals': MealMonthlyCounter.meals + meals, 'days': MealMonthlyCounter.days + days},
+    )
+    await session.execute(statement)
+
+
+def make_check_in_response(result: CheckInStatus, headers: dict[str, str] | None = None) -> Response:
+    if result == CheckInStatus.not_found:
         return Response(status_code=status.HTTP_404_NOT_FOUND,
-                        content=make_response_message('Купон не найден'), media_type='application/json')
-    if len(ticket.meals) >= MEALS_LIMIT:
+                        content=make_response_message('Купон не найден'), media_type='application/json',
+                        headers=headers)
+    if result == CheckInStatus.limit_reached:
         return Response(status_code=status.HTTP_403_FORBIDDEN,
-                        content=make_response_message('Достигнут лимит'), media_type='application/json')
-    meal = [dict(ticket_uuid=ticket.uuid.hex, time=datetime.now(tz=timezone.utc))]
-    statement = insert(Meal).values(meal)
-    await session.execute(statement)
-    await session.commit()
+                        content=make_response_message('Достигнут лимит'), media_type='application/json',
+                        headers=headers)
+    if result == CheckInStatus.rejected:
+        return Response(status_code=status.HTTP_403_FORBIDDEN,
+                        content=make_response_message('QR-код купона отклонён'), media_type='application/json',
+                        headers=headers)
+    if result == CheckInStatus.invalid:
+        return Response(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        content=make_response_message('Информация на QR-коде не является UUID'),
+                        media_type='application/json', headers=headers)
     return Response(status_code=status.HTTP_200_OK,
-                    content=make_response_message('Приём пищи учтён'), media_type='application/json')
+                    content=make_response_message('Приём пищи учтён'), media_type='application/json',
+                    headers=headers)
+
+
+def get_insert(session: AsyncSession) -> Callable[..., Insert]:
+    if session.bind.dialect.name == 'postgresql':
+        return postgresql_insert
+    return sqlite_insert
 
 
 async def meal_delete(meal: MealIn, session):
-    statement = select(Meal).where(Meal.id == meal.id)
+    statement = select(Meal.ticket_uuid, Meal.time).where(Meal.id == meal.id)
     result = await session.execute(statement)
-    if result.scalar() is None:
+    row = result.first()
+    if row is None:
         return Response(status_code=status.HTTP_404_NOT_FOUND)
+    ticket_uuid, time = row
     statement = delete(Meal).where(Meal.id == meal.id)
     await session.execute(statement)
+    statement = (
+        update(MealCounter)
+        .where(MealCounter.ticket_uuid == ticket_uuid, MealCounter.day == meal_day(time), MealCounter.count > 0)
+        .values(count=MealCounter.count - 1)
+        .returning(MealCounter.count)
+    )
+    count = (await session.execute(statement)).scalar()
+    if count is not None:
+        await update_rollups(ticket_uuid, meal_day(time), -1, -int(count == 0), session)
     await session.commit()
+    ticket_index.cancel_meal(ticket_uuid, meal_day(time))
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
-async def retrieve_meals(session: AsyncSession) -> list[dict[str, Any]]:
-    return await retrieve_model_items(Meal, session)
+async def retrieve_meals(session: AsyncSession, cursor: str | None = None, limit: int | None = None,
+                         fmt: str = 'json') -> Response:
+    return await retrieve_model_items(Meal, session, cursor, limit, fmt)
+
+
+async def retrieve_model_items(model: Base, session: AsyncSession, cursor: str | None = None,
+                               limit: int | None = None, fmt: str = 'json') -> Response:
+    order = LIST_ORDER[model]
+    statement = select(*LIST_COLUMNS[model]).order_by(*order)
+    if cursor:
+        try:
+            after = parse_cursor(cursor, order)
+        except (TypeError, ValueError):
+            return Response(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            content=make_response_message('Некорректный курсор'), media_type='application/json')
+        statement = statement.where(tuple_(*order) > tuple_(*after))
+    if fmt == 'ndjson':
+        if limit:
+            statement = statement.limit(limit)
+        return StreamingResponse(iter_ndjson(statement, LIST_KEYS[model]), media_type='application/x-ndjson')
+
+    limit = min(limit or ITEMS_LIMIT, ITEMS_LIMIT)
+    rows = (await session.execute(statement.limit(limit))).all()
+    headers = {}
+    if len(rows) == limit:
+        headers['X-Next-Cursor'] = encode_cursor([rows[-1][position] for position in LIST_CURSOR_POSITIONS[model]])
+    # готовый Response FastAPI не пропускает через response_model: он остаётся только для документации
+    return Response(content=dump_rows(LIST_KEYS[model], rows), media_type='application/json', headers=headers)
+
+
+async def iter_ndjson(statement: Select, keys: tuple[str, ...]) -> AsyncIterator[bytes]:
+    async with async_read_session() as session:
+        result = await session.stream(statement)
+        async for rows in result.partitions(NDJSON_CHUNK_ROWS):
+            yield dump_rows_ndjson(keys, rows)
+
+
+def parse_cursor(cursor: str, order: tuple[Column, ...]) -> list[Any]:
+    values = decode_cursor(cursor)
+    if len(values) != len(order):
+        raise ValueError('cursor length does not match ordering')
+    parsed = []
+    for column, value in zip(order, values):
+        if isinstance(column.type, DateTime):
+            value = as_utc(datetime.fromisoformat(value))
+        elif isinstance(column.type, Uuid):
+            value = UUID(value)
+        elif not isinstance(value, int):
+            raise ValueError('cursor value must be an integer')
+        parsed.append(value)
+    return parsed
 
 
-async def retrieve_model_items(model: Base, session: AsyncSession) -> list[dict[str, Any]]:
-    result = await session.execute(select(model).limit(ITEMS_LIMIT))
-    items = [item.__dict__ for item, *_ in result.unique().all()]
-    return items
+def make_busy_response() -> Response:
+    return Response(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    content=make_response_message('Сервер перегружен, повторите попытку позже'),
+                    media_type='application/json', headers={'Retry-After': '1'})
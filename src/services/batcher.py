@@ -0,0 +1,144 @@
+import asyncio
+import logging
+from collections import deque
+from contextlib import suppress
+from datetime import datetime
+from time import perf_counter
+from typing import Awaitable, Callable, NamedTuple
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.api.v1.schemas import CheckInStatus
+from src.core.metrics import observe_stage, registry
+from src.db.database import async_session
+
+logger = logging.getLogger(__name__)
+
+batch_records = registry.histogram('meal_write_batch_records', 'Отметок в одной транзакции пакетной записи',
+                                   buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+batch_flush_duration = registry.histogram('meal_write_batch_flush_seconds', 'Время записи пачки отметок')
+
+Apply = Callable[[list[UUID], AsyncSession, datetime], Awaitable[list[CheckInStatus]]]
+Committed = Callable[[list[UUID], list[CheckInStatus], datetime], None]
+
+
+class PendingCheckIn(NamedTuple):
+    ticket_uuids: list[UUID]
+    time: datetime
+    future: asyncio.Future
+
+
+class MealWriteBatcher:
+    # отметки из параллельных запросов копятся до max_size записей или max_delay секунд и записываются
+    # одной транзакцией: один fsync на пачку вместо одного на скан. Внутри пачки отметки применяются
+    # по очереди, поэтому лимит по купону, отсканированному дважды в одной пачке, проверяется как обычно
+    def __init__(self, enabled: bool, max_size: int, max_delay: float, apply: Apply, committed: Committed) -> None:
+        self.enabled = enabled
+        self.max_size = max(max_size, 1)
+        self.max_delay = max_delay
+        self.apply = apply
+        self.committed = committed
+        self._pending: deque[PendingCheckIn] = deque()
+        self._records = 0
+        self._ready: asyncio.Event | None = None
+        self._full: asyncio.Event | None = None
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and not self._stopping
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            # _ready будит писателя при первой отметке, _full - когда набралась полная пачка; писатель
+            # перезапускается после stop, поэтому события пересоздаются вместе с ним
+            self._ready, self._full = asyncio.Event(), asyncio.Event()
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # накопленные отметки дописываются до остановки
+        if self._task is None:
+            return
+        self._stopping = True
+        self._ready.set()
+        self._full.set()
+        await self._task
+        self._task = None
+
+    async def submit(self, ticket_uuids: list[UUID], time: datetime) -> list[CheckInStatus]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(PendingCheckIn(ticket_uuids, time, future))
+        self._records += len(ticket_uuids)
+        self._ready.set()
+        if self._records >= self.max_size:
+            self._full.set()
+        started = perf_counter()
+        try:
+            return await future
+        finally:
+            observe_stage('batch_wait', perf_counter() - started)
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            if not self._pending:
+                if self._stopping:
+                    return
+                self._ready.clear()
+                continue
+            if not self._full.is_set():
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+            await self._flush(self._take())
+
+    def _take(self) -> list[PendingCheckIn]:
+        batch, records = [], 0
+        while self._pending and (not batch or records + len(self._pending[0].ticket_uuids) <= self.max_size):
+            item = self._pending.popleft()
+            batch.append(item)
+            records += len(item.ticket_uuids)
+        self._records -= records
+        if self._records < self.max_size and not self._stopping:
+            self._full.clear()
+        if not self._pending and not self._stopping:
+            self._ready.clear()
+        return batch
+
+    async def _flush(self, batch: list[PendingCheckIn]) -> None:
+        started = perf_counter()
+        try:
+            async with async_session() as session:
+                results = [await self.apply(item.ticket_uuids, session, item.time) for item in batch]
+                await session.commit()
+        except Exception:
+            # одна ошибочная отметка не должна ронять всю пачку: каждая повторяется своей транзакцией
+            logger.warning('Пачка из %s отметок не записана, отметки записываются по одной', len(batch),
+                           exc_info=True)
+            for item in batch:
+                await self._flush_one(item)
+            return
+        finally:
+            batch_flush_duration.observe(perf_counter() - started)
+        batch_records.observe(sum(len(item.ticket_uuids) for item in batch))
+        for item, result in zip(batch, results):
+            self._resolve(item, result)
+
+    async def _flush_one(self, item: PendingCheckIn) -> None:
+        try:
+            async with async_session() as session:
+                result = await self.apply(item.ticket_uuids, session, item.time)
+                await session.commit()
+        except Exception as error:
+            if not item.future.done():
+                item.future.set_exception(error)
+            return
+        self._resolve(item, result)
+
+    def _resolve(self, item: PendingCheckIn, result: list[CheckInStatus]) -> None:
+        self.committed(item.ticket_uuids, result, item.time)
+        # запрос мог быть отменён (клиент отключился), но отметка уже записана
+        if not item.future.done():
+            item.future.set_result(result)
@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from src.core.config import QR_CACHE_DIR, QR_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+class BytesLRUCache:
+    # вытесняет давно не использованные записи, когда суммарный размер превышает max_bytes;
+    # если задан directory, записи дублируются на диск и переживают перезапуск. get, set и in работают
+    # только с памятью; диск читается и пишется в потоке (load, store, exists), чтобы не блокировать цикл событий
+    def __init__(self, max_bytes: int, directory: str = '') -> None:
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.size = 0
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+
+    def get(self, key: str) -> bytes | None:
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        self._remember(key, value)
+
+    async def exists(self, key: str) -> bool:
+        if key in self._items:
+            return True
+        return bool(self.directory) and await asyncio.to_thread(os.path.exists, self._path(key))
+
+    async def load(self, key: str) -> bytes | None:
+        value, = await self.load_many([key])
+        return value
+
+    async def load_many(self, keys: list[str]) -> list[bytes | None]:
+        # промахи памяти читаются с диска одним заходом в поток
+        values = [self.get(key) for key in keys]
+        missing = [index for index, value in enumerate(values) if value is None]
+        if not self.directory or not missing:
+            return values
+        loaded = await asyncio.to_thread(lambda: [self._read(keys[index]) for index in missing])
+        for index, value in zip(missing, loaded):
+            if value is not None:
+                values[index] = value
+                self._remember(keys[index], value)
+        return values
+
+    async def store(self, key: str, value: bytes) -> None:
+        await self.store_many([(key, value)])
+
+    async def store_many(self, items: list[tuple[str, bytes]]) -> None:
+        for key, value in items:
+            self._remember(key, value)
+        if self.directory and items:
+            await asyncio.to_thread(lambda: [self._write(key, value) for key, value in items])
+
+    def _read(self, key: str) -> bytes | None:
+        try:
+            with open(self._path(key), 'rb') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, value: bytes) -> None:
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as file:
+                file.write(value)
+            os.replace(tmp_path, path)
+        except OSError as error:
+            logger.warning('Не удалось сохранить %s: %s', path, error)
+
+    def _remember(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        previous = self._items.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._items[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+
+def make_cache_key(*parts: str) -> str:
+    return hashlib.sha256('\x00'.join(parts).encode()).hexdigest()[:32]
+
+
+qr_cache = BytesLRUCache(QR_CACHE_MAX_BYTES, QR_CACHE_DIR)
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+from src.core import config
+from src.core.metrics import executor_queue_wait, executor_rejected, executor_run_duration, observe_stage, registry
+
+logger = logging.getLogger(__name__)
+
+BUSY_RETRY_DELAY = 0.05
+
+
+class ExecutorBusyError(Exception):
+    pass
+
+
+def timed_call(func: Callable[..., Any], *args: Any) -> tuple[Any, float]:
+    # выполняется в воркере: собственное время задачи отделяет её работу от ожидания в очереди
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+class BoundedExecutor:
+    # задачи сверх workers + queue_size не ждут в очереди, а сразу отклоняются
+    def __init__(self, name: str, kind: str, workers: int, queue_size: int) -> None:
+        self.name = name
+        self.kind = kind
+        self.workers = max(workers, 1)
+        self.limit = self.workers + max(queue_size, 0)
+        self.pending = 0
+        self._executor: Executor | None = None
+
+    def start(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._create()
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _create(self) -> Executor:
+        if self.kind == 'process':
+            try:
+                return ProcessPoolExecutor(max_workers=self.workers)
+            except (ImportError, NotImplementedError, OSError) as error:
+                logger.warning('Пул процессов недоступен (%s), используется пул потоков', error)
+                self.kind = 'thread'
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+    async def warm_up(self, func: Callable[[], Any]) -> set[Any]:
+        # по задаче на воркер, чтобы тяжёлые модули загрузились до первого запроса
+        loop = asyncio.get_running_loop()
+        executor = self.start()
+        return set(await asyncio.gather(*(loop.run_in_executor(executor, func) for _ in range(self.workers))))
+
+    def transferable(self, buffer: memoryview) -> memoryview | bytes:
+        # потоки читают буфер запроса напрямую, процессам его нужно передать копией
+        return buffer if self.kind == 'thread' else buffer.tobytes()
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.limit:
+            executor_rejected.inc(self.name)
+            raise ExecutorBusyError
+        loop = asyncio.get_running_loop()
+        executor = self.start()
+        start = time.perf_counter()
+        self.pending += 1
+        try:
+            future = executor.submit(timed_call, func, *args)
+        except Exception as error:
+            self.pending -= 1
+            if isinstance(error, BrokenProcessPool):
+                self._discard(executor)
+            raise
+        # место освобождается, когда задача завершилась в воркере: отмена ожидающего запроса её не останавливает
+        future.add_done_callback(lambda _: self._release(loop))
+        try:
+            result, duration = await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+        wait = max(time.perf_counter() - start - duration, 0.0)
+        executor_run_duration.observe(duration, self.name)
+        executor_queue_wait.observe(wait, self.name)
+        observe_stage(self.name, duration)
+        observe_stage('queue_wait', wait)
+        return result
+
+    def _release(self, loop: asyncio.AbstractEventLoop) -> None:
+        # вызывается из потока пула
+        with suppress(RuntimeError):
+            loop.call_soon_threadsafe(self._finished)
+
+    def _finished(self) -> None:
+        self.pending -= 1
+
+    def _discard(self, executor: Executor) -> None:
+        # сломанный пул закрывается, не дожидаясь задач, и следующая задача запускает новый
+        executor.shutdown(wait=False, cancel_futures=True)
+        if self._executor is executor:
+            self._executor = None
+
+    async def run_when_free(self, func: Callable[..., Any], *args: Any) -> Any:
+        # для фоновой работы: вместо отказа при полной очереди ждёт, пока в ней освободится место
+        while True:
+            try:
+                return await self.run(func, *args)
+            except ExecutorBusyError:
+                await asyncio.sleep(BUSY_RETRY_DELAY)
+
+
+decode_executor = BoundedExecutor('decode', config.DECODE_EXECUTOR, config.DECODE_WORKERS, config.DECODE_QUEUE_SIZE)
+render_executor = BoundedExecutor('render', config.RENDER_EXECUTOR, config.RENDER_WORKERS, config.RENDER_QUEUE_SIZE)
+
+executor_pending = registry.gauge('executor_pending_tasks', 'Задачи в работе и в очереди', ('executor',))
+executor_limit = registry.gauge('executor_max_tasks', 'Предел задач в работе и в очереди', ('executor',))
+for bounded in (decode_executor, render_executor):
+    executor_pending.set_function(lambda bounded=bounded: bounded.pending, bounded.name)
+    executor_limit.set_function(lambda bounded=bounded: bounded.limit, bounded.name)
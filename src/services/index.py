@@ -0,0 +1,155 @@
+import logging
+from datetime import date, datetime, timezone
+from typing import Iterable
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.api.v1.schemas import CheckInStatus
+from src.core.config import MEALS_LIMIT, TICKET_INDEX_ENABLED, WORKERS
+from src.models.users import MealCounter, Ticket
+from src.services.utils import meal_day
+
+logger = logging.getLogger(__name__)
+
+WARM_CHUNK_ROWS = 5000
+KEY_SIZE = 16
+COUNT_OFFSET = 32
+RECORD_SIZE = 33
+
+
+class TicketIndex:
+    # отсортированный по uuid купона массив записей по 33 байта: uuid купона, uuid владельца
+    # и число приёмов пищи за текущий день; 100 тыс. купонов занимают ~3.3 МБ.
+    # Обновляется после каждого коммита и позволяет отклонять неизвестные и исчерпанные
+    # купоны без запроса в БД
+    def __init__(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self.ready = False
+        self.day: date | None = None
+        self._data = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._data) // RECORD_SIZE
+
+    def __contains__(self, ticket_uuid: UUID) -> bool:
+        return self._find(ticket_uuid.bytes)[1]
+
+    def owner(self, ticket_uuid: UUID) -> UUID | None:
+        offset, found = self._find(ticket_uuid.bytes)
+        return UUID(bytes=bytes(self._data[offset + KEY_SIZE:offset + COUNT_OFFSET])) if found else None
+
+    def meals(self, ticket_uuid: UUID) -> int:
+        self._roll(meal_day(datetime.now(timezone.utc)))
+        offset, found = self._find(ticket_uuid.bytes)
+        return self._data[offset + COUNT_OFFSET] if found else 0
+
+    def check(self, ticket_uuid: UUID) -> CheckInStatus | None:
+        if not self.ready:
+            return None
+        self._roll(meal_day(datetime.now(timezone.utc)))
+        offset, found = self._find(ticket_uuid.bytes)
+        if not found:
+            return CheckInStatus.not_found
+        if self._data[offset + COUNT_OFFSET] >= MEALS_LIMIT:
+            return CheckInStatus.limit_reached
+        return None
+
+    def add(self, ticket_uuid: UUID, user_uuid: UUID) -> None:
+        if not self.enabled:
+            return
+        offset, found = self._find(ticket_uuid.bytes)
+        record = ticket_uuid.bytes + user_uuid.bytes + b'\x00'
+        if found:
+            self._data[offset:offset + RECORD_SIZE] = record
+        else:
+            self._data[offset:offset] = record
+
+    def add_many(self, tickets: Iterable[tuple[UUID, UUID]]) -> None:
+        # пачку дешевле слить пересортировкой, чем вставлять по одной записи со сдвигом массива
+        if not self.enabled:
+            return
+        records = {bytes(self._data[offset:offset + KEY_SIZE]): bytes(self._data[offset:offset + RECORD_SIZE])
+                   for offset in range(0, len(self._data), RECORD_SIZE)}
+        records.update((ticket_uuid.bytes, ticket_uuid.bytes + user_uuid.bytes + b'\x00')
+                       for ticket_uuid, user_uuid in tickets)
+        self._data = bytearray(b''.join(records[key] for key in sorted(records)))
+
+    def remove(self, ticket_uuid: UUID) -> None:
+        offset, found = self._find(ticket_uuid.bytes)
+        if found:
+            del self._data[offset:offset + RECORD_SIZE]
+
+    def record_meal(self, ticket_uuid: UUID, day: date) -> None:
+        if not self.enabled or not self._roll(day):
+            return
+        offset, found = self._find(ticket_uuid.bytes)
+        if found and self._data[offset + COUNT_OFFSET] < 255:
+            self._data[offset + COUNT_OFFSET] += 1
+
+    def cancel_meal(self, ticket_uuid: UUID, day: date) -> None:
+        if not self.enabled or not self._roll(day):
+            return
+        offset, found = self._find(ticket_uuid.bytes)
+        if found and self._data[offset + COUNT_OFFSET] > 0:
+            self._data[offset + COUNT_OFFSET] -= 1
+
+    def _find(self, key: bytes) -> tuple[int, bool]:
+        data = self._data
+        low, high = 0, len(data) // RECORD_SIZE
+        while low < high:
+            middle = (low + high) // 2
+            offset = middle * RECORD_SIZE
+            current = data[offset:offset + KEY_SIZE]
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                return offset, True
+        return low * RECORD_SIZE, False
+
+    def _roll(self, day: date) -> bool:
+        # счётчики хранятся только за текущий день; возвращает True, если day - текущий день
+        today = meal_day(datetime.now(timezone.utc))
+        if self.day != today:
+            self.day = today
+            self._data[COUNT_OFFSET::RECORD_SIZE] = bytes(len(self))
+        return day == today
+
+    async def warm(self, session: AsyncSession) -> None:
+        if not self.enabled:
+            return
+        self.ready = False
+        self._data = bytearray()
+        self.day = meal_day(datetime.now(timezone.utc))
+        tickets = []
+        result = await session.stream(select(Ticket.uuid, Ticket.user_uuid))
+        async for rows in result.partitions(WARM_CHUNK_ROWS):
+            tickets.extend(rows)
+        self.add_many(tickets)
+        del tickets
+        result = await session.stream(
+            select(MealCounter.ticket_uuid, MealCounter.count).where(MealCounter.day == self.day)
+        )
+        eaten = 0
+        async for rows in result.partitions(WARM_CHUNK_ROWS):
+            for ticket_uuid, count in rows:
+                offset, found = self._find(ticket_uuid.bytes)
+                if found:
+                    self._data[offset + COUNT_OFFSET] = min(count, 255)
+                    eaten += 1
+        self.ready = True
+        logger.info('Индекс купонов загружен: %s купонов, %s с приёмами пищи сегодня', len(self), eaten)
+
+
+def create_ticket_index(enabled: bool, workers: int) -> TicketIndex:
+    # индекс живёт в памяти процесса: при нескольких воркерах uvicorn купоны, выпущенные и погашенные
+    # в соседнем воркере, в нём не видны, и отказы по индексу были бы ложными
+    if enabled and workers > 1:
+        logger.warning('Индекс купонов отключён: он не разделяется между %s воркерами', workers)
+    return TicketIndex(enabled and workers == 1)
+
+
+ticket_index = create_ticket_index(TICKET_INDEX_ENABLED, WORKERS)
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from typing import Iterable, NamedTuple
+from uuid import UUID
+
+from sqlalchemy import select, tuple_
+
+from src.core.config import (QR_PRERENDER, QR_PRERENDER_CONCURRENCY, QR_PRERENDER_FORMATS, QR_PRERENDER_QUEUE_SIZE,
+                             QR_PRERENDER_WARMUP, QR_PRERENDER_WARMUP_LIMIT)
+from src.core.metrics import registry
+from src.db.database import async_read_session
+from src.models.users import Ticket
+from src.services.cache import make_cache_key, qr_cache
+from src.services.executor import render_executor
+from src.services.qr import MEDIA_TYPES, get_render_params, render
+from src.services.signing import qr_signer
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_PAGE = 1000
+
+prerender_lag = registry.histogram('qr_prerender_lag_seconds',
+                                   'Время от постановки купона в очередь фонового рендера до готовых QR-кодов')
+prerender_images = registry.counter('qr_prerender_images_total', 'QR-коды, обработанные фоновым рендером',
+                                    ('result',))
+prerender_queue = registry.gauge('qr_prerender_queue_size', 'Купоны в очереди фонового рендера')
+
+
+class PrerenderTask(NamedTuple):
+    ticket_uuid: UUID
+    formats: tuple[str, ...]
+    enqueued: float
+
+
+def parse_formats(value: str) -> tuple[str, ...]:
+    formats = tuple(item.strip() for item in value.split(',') if item.strip())
+    for fmt in formats:
+        if fmt not in MEDIA_TYPES:
+            raise ValueError(f'Неизвестный формат QR-кода для фонового рендера: {fmt!r}')
+    return formats
+
+
+class QRPrerenderer:
+    # QR-коды новых купонов рисуются в фоне, чтобы первый POST /qr отдавался из кэша.
+    # Одновременно рендерится не больше concurrency кодов: остальные места пула рендера
+    # остаются запросам. При переполнении очереди купон пропускается - его код нарисуется по запросу
+    def __init__(self, enabled: bool, formats: tuple[str, ...], concurrency: int, queue_size: int,
+                 warm_up: bool, warm_up_limit: int = 0) -> None:
+        self.enabled = enabled and bool(formats)
+        self.formats = formats
+        self.concurrency = max(concurrency, 1)
+        self.queue_size = queue_size
+        self.warm_up = warm_up
+        self.warm_up_limit = warm_up_limit
+        self._queue: asyncio.Queue[PrerenderTask] | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    def start(self) -> None:
+        if not self.enabled or self._tasks:
+            return
+        # очередь ограничена queue_size: выпуск купонов не ждёт рендера, а прогрев ждёт свободного места
+        self._queue = asyncio.Queue(self.queue_size)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        if self.warm_up:
+            self._tasks.append(asyncio.create_task(self._warm_up()))
+
+    async def stop(self) -> None:
+        # кэш не обязателен, поэтому оставшиеся в очереди купоны не дорисовываются
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+        self._queue = None
+
+    async def wait(self, key: str, timeout: float) -> bytes | None:
+        # запрос за кодом, который уже рисуется в фоне, ждёт его, а не рисует второй раз;
+        # None - код не рисуется, не нарисовался или не успел за timeout секунд
+        future = self._in_flight.get(key)
+        if future is None:
+            return None
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, ticket_uuids: Iterable[UUID], rendered: str | None = None) -> None:
+        # rendered - формат, который вызывающий код рисует сам (например, для архива купонов)
+        formats = tuple(fmt for fmt in self.formats if fmt != rendered)
+        if self._queue is None or not formats:
+            return
+        enqueued = time.perf_counter()
+        for ticket_uuid in ticket_uuids:
+            try:
+                self._queue.put_nowait(PrerenderTask(ticket_uuid, formats, enqueued))
+            except asyncio.QueueFull:
+                prerender_images.inc('dropped', amount=len(formats))
+
+    async def _work(self) -> None:
+        while True:
+            task = await self._queue.get()
+            try:
+                await self._render(task)
+            except Exception:
+                prerender_images.inc('failed', amount=len(task.formats))
+                logger.warning('Не удалось заранее нарисовать QR-код купона %s', task.ticket_uuid, exc_info=True)
+            prerender_lag.observe(time.perf_counter() - task.enqueued)
+
+    async def _render(self, task: PrerenderTask) -> None:
+        # ключ кэша тот же, что в create_qr: данные кода (с подписью, если она включена) и параметры рендера
+        payload = qr_signer.issue(task.ticket_uuid)
+        for fmt in task.formats:
+            key = make_cache_key(payload, get_render_params(fmt))
+            if await qr_cache.exists(key):
+                prerender_images.inc('cached')
+                continue
+            future = self._in_flight.get(key)
+            if future is not None:
+                # купон попал в очередь дважды (например, при прогреве и при выпуске), и его код
+                # уже рисует другой обработчик
+                await asyncio.shield(future)
+                prerender_images.inc('cached')
+                continue
+            future = self._in_flight[key] = asyncio.get_running_loop().create_future()
+            content = None
+            try:
+                content = await render_executor.run_when_free(render, payload, fmt)
+                await qr_cache.store(key, content)
+                prerender_images.inc('rendered')
+            finally:
+                # ожидающие будятся в первую очередь; при ошибке они получают None и рисуют код сами
+                future.set_result(content)
+                self._in_flight.pop(key, None)
+
+    async def _warm_up(self) -> None:
+        # при старте воркера в очередь ставятся все купоны (или последние warm_up_limit), начиная с новых:
+        # их запрашивают чаще, а коды, которые уже есть в кэше, обработчик пропускает. Купоны читаются
+        # страницами, и соединение освобождается до постановки в очередь, которая ждёт свободного места
+        queued, after = 0, None
+        while not self.warm_up_limit or queued < self.warm_up_limit:
+            statement = select(Ticket.created, Ticket.uuid).order_by(Ticket.created.desc(), Ticket.uuid.desc())
+            if after is not None:
+                statement = statement.where(tuple_(Ticket.created, Ticket.uuid) < tuple_(*after))
+            size = WARM_UP_PAGE if not self.warm_up_limit else min(WARM_UP_PAGE, self.warm_up_limit - queued)
+            async with async_read_session() as session:
+                rows = (await session.execute(statement.limit(size))).all()
+            for _, ticket_uuid in rows:
+                await self._queue.put(PrerenderTask(ticket_uuid, self.formats, time.perf_counter()))
+            queued += len(rows)
+            if len(rows) < size:
+                break
+            after = rows[-1]
+        logger.info('В очередь фонового рендера QR-кодов поставлено купонов при старте: %s', queued)
+
+
+qr_prerenderer = QRPrerenderer(QR_PRERENDER, parse_formats(QR_PRERENDER_FORMATS), QR_PRERENDER_CONCURRENCY,
+                               QR_PRERENDER_QUEUE_SIZE, QR_PRERENDER_WARMUP, QR_PRERENDER_WARMUP_LIMIT)
+prerender_queue.set_function(qr_prerenderer.pending)
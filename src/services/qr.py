@@ -1,35 +1,226 @@
 import io
-from typing import Iterable
+import os
+import struct
+import threading
+import zlib
+from typing import TYPE_CHECKING, Iterable, NamedTuple
 
-import cv2
-import qrcode
-import numpy as np
-from qrcode.image.pure import PyPNGImage
+from src.core.config import DECODE_TARGET_SIZE, QR_MASK_PATTERN
 
+# OpenCV, numpy, qrcode и PIL импортируются при первом использовании: процесс приложения
+# стартует без них, а в воркерах пулов они загружаются прогревом (warm_up_decoder)
+if TYPE_CHECKING:
+    import cv2
+    import numpy as np
+    import qrcode
+    from qrcode.image.base import BaseImage
 
-# def get_images(data: Iterable[str]) -> list[PyPNGImage]:
-#     return [type(qrcode.make(item)) for item in data]
-qr = qrcode.QRCode(
-            version=1,
+ROI_MARGIN = 0.15
+QR_VERSION = 1
+BOX_SIZE = 10
+BORDER = 4
+FILL_COLOR = 'green'
+BACK_COLOR = 'white'
+MEDIA_TYPES = {'png': 'image/png', 'png1': 'image/png', 'svg': 'image/svg+xml'}
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG1_PALETTE = bytes((255, 255, 255, 0, 128, 0))
+
+
+class DecodeResult(NamedTuple):
+    data: str
+    path: str
+
+
+class MultiDecodeResult(NamedTuple):
+    data: list[str]
+    undecoded: int
+    path: str
+
+
+_local = threading.local()
+
+
+def get_encoder() -> 'qrcode.QRCode':
+    # у каждого потока/процесса пула свой кодировщик: общий объект нельзя
+    # переиспользовать параллельно, т.к. clear()/add_data() меняют его состояние
+    encoder = getattr(_local, 'encoder', None)
+    if encoder is None:
+        import qrcode
+
+        encoder = _local.encoder = qrcode.QRCode(
             error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-)
+            box_size=BOX_SIZE,
+            border=BORDER,
+            mask_pattern=QR_MASK_PATTERN,
+        )
+    encoder.clear()
+    encoder.version = QR_VERSION
+    return encoder
+
+
+def get_image(data: str) -> 'BaseImage':
+    encoder = get_encoder()
+    encoder.add_data(data)
+    return encoder.make_image(fill_color=FILL_COLOR, back_color=BACK_COLOR)
+
+
+def get_images(data: Iterable[str], fmt: str = 'png') -> list[bytes]:
+    return [render(item, fmt) for item in data]
+
+
+def get_matrix(data: str) -> list[list[bool]]:
+    encoder = get_encoder()
+    encoder.add_data(data)
+    return encoder.get_matrix()
+
+
+def get_render_params(fmt: str) -> str:
+    return f'{fmt}:{QR_VERSION}:L:{QR_MASK_PATTERN}:{BOX_SIZE}:{BORDER}:{FILL_COLOR}:{BACK_COLOR}'
+
+
+def render(data: str, fmt: str = 'png') -> bytes:
+    if fmt == 'png1':
+        return render_png1(get_matrix(data))
+    if fmt == 'svg':
+        return render_svg(get_matrix(data))
+    file = io.BytesIO()
+    get_image(data).save(file, 'png')
+    return file.getvalue()
+
+
+def render_png1(matrix: list[list[bool]]) -> bytes:
+    # PNG с палитрой из двух цветов и глубиной 1 бит, собирается без PIL
+    size = len(matrix) * BOX_SIZE
+    row_bytes = (size + 7) // 8
+    raw = bytearray()
+    for row in matrix:
+        bits = ''.join(('1' if module else '0') * BOX_SIZE for module in row)
+        raw += (b'\x00' + int(bits.ljust(row_bytes * 8, '0'), 2).to_bytes(row_bytes, 'big')) * BOX_SIZE
+    header = struct.pack('>IIBBBBB', size, size, 1, 3, 0, 0, 0)
+    return b''.join((PNG_SIGNATURE, png_chunk(b'IHDR', header), png_chunk(b'PLTE', PNG1_PALETTE),
+                     png_chunk(b'IDAT', zlib.compress(bytes(raw))), png_chunk(b'IEND', b'')))
+
+
+def png_chunk(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I', len(payload)) + kind + payload + struct.pack('>I', zlib.crc32(kind + payload))
+
+
+def render_svg(matrix: list[list[bool]]) -> bytes:
+    size = len(matrix)
+    path = ''.join(f'M{x},{y}h1v1h-1z' for y, row in enumerate(matrix) for x, module in enumerate(row) if module)
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{size * BOX_SIZE}" height="{size * BOX_SIZE}" '
+            f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+            f'<rect width="{size}" height="{size}" fill="{BACK_COLOR}"/>'
+            f'<path d="{path}" fill="{FILL_COLOR}"/></svg>').encode()
+
+
+def get_detector() -> 'cv2.QRCodeDetector':
+    # детектор создаётся один раз на поток/процесс пула и переиспользуется
+    detector = getattr(_local, 'detector', None)
+    if detector is None:
+        import cv2
+
+        detector = _local.detector = cv2.QRCodeDetector()
+    return detector
+
+
+def get_multi_detector() -> 'cv2.QRCodeDetectorAruco':
+    # детектор на основе ArUco находит несколько кодов в кадре надёжнее классического,
+    # который теряет коды уже при четырёх-пяти в кадре
+    detector = getattr(_local, 'multi_detector', None)
+    if detector is None:
+        import cv2
+
+        detector = _local.multi_detector = cv2.QRCodeDetectorAruco()
+    return detector
+
+
+def warm_up_decoder() -> int:
+    # загружает OpenCV и создаёт детекторы в воркере пула до первого скана; возвращает pid воркера
+    import numpy as np
+
+    get_detector().detectAndDecode(np.zeros((32, 32), dtype=np.uint8))
+    get_multi_detector()
+    return os.getpid()
+
+
+def decode(content: bytes | memoryview) -> DecodeResult:
+    import cv2
+    import numpy as np
+
+    image = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return DecodeResult('', 'none')
+    detector = get_detector()
+    height, width = image.shape
+    scale = DECODE_TARGET_SIZE / max(height, width)
+    region = getattr(_local, 'region', None)
+    if scale < 1:
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        data, points = detect_and_decode(detector, small)
+        if data:
+            _local.region = get_region(points / scale, width, height)
+            return DecodeResult(data, 'fast')
+        if points is not None:
+            region = get_region(points / scale, width, height)
+    if region is not None and region[2] <= width and region[3] <= height:
+        left, top, right, bottom = region
+        data, _ = detect_and_decode(detector, image[top:bottom, left:right])
+        if data:
+            _local.region = region
+            return DecodeResult(data, 'roi')
+    data, points = detect_and_decode(detector, image)
+    if not data:
+        return DecodeResult('', 'none')
+    _local.region = get_region(points, width, height)
+    return DecodeResult(data, 'full')
+
+
+def detect_and_decode(detector: 'cv2.QRCodeDetector', image: 'np.ndarray') -> tuple[str, 'np.ndarray | None']:
+    # на части кадров (чаще на вырезанной области) OpenCV падает внутри поиска кода с cv2.error;
+    # такой проход считается неудачным, и распознавание продолжается следующим
+    import cv2
+
+    try:
+        data, points, _ = detector.detectAndDecode(image)
+    except cv2.error:
+        return '', None
+    return data, points
+
+
+def decode_all(content: bytes | memoryview) -> MultiDecodeResult:
+    # время поиска растёт с числом пикселей, поэтому сначала ищем на уменьшенном снимке;
+    # полный размер - только если там ничего не нашлось или часть кодов не распозналась
+    import cv2
+    import numpy as np
 
+    image = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return MultiDecodeResult([], 0, 'none')
+    scale = DECODE_TARGET_SIZE / max(image.shape)
+    if scale < 1:
+        result = decode_multi(cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA), 'fast')
+        if result.data and not result.undecoded:
+            return result
+    return decode_multi(image, 'full')
 
-def get_image(data: str) -> PyPNGImage:
-    qr.clear()
-    qr.add_data(data)
-    return qr.make_image(fill_color='green', back_color='white')
 
+def decode_multi(image: 'np.ndarray', path: str) -> MultiDecodeResult:
+    import cv2
 
-def get_images(data: Iterable[str]) -> list[PyPNGImage]:
-    return [get_image(item) for item in data]
+    try:
+        found, data, *_ = get_multi_detector().detectAndDecodeMulti(image)
+    except cv2.error:
+        return MultiDecodeResult([], 0, 'none')
+    if not found:
+        return MultiDecodeResult([], 0, 'none')
+    # найденные, но не распознанные коды возвращаются пустыми строками
+    decoded = [item for item in data if item]
+    return MultiDecodeResult(decoded, len(data) - len(decoded), path)
 
 
-def decode(buffer: io.BytesIO) -> str:
-    detect = cv2.QRCodeDetector()
-    array = np.frombuffer(buffer.read(), dtype=np.uint8)
-    obj = cv2.imdecode(array, 0)
-    data, *_ = detect.detectAndDecode(obj)
-    return data
+def get_region(points: 'np.ndarray', width: int, height: int) -> tuple[int, int, int, int]:
+    xs, ys = points.reshape(-1, 2).T
+    margin = ROI_MARGIN * max(xs.max() - xs.min(), ys.max() - ys.min())
+    return (max(int(xs.min() - margin), 0), max(int(ys.min() - margin), 0),
+            min(int(xs.max() + margin) + 1, width), min(int(ys.max() + margin) + 1, height))
@@ -0,0 +1,137 @@
+import calendar
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any
+
+from fastapi import Response, status
+from sqlalchemy import Date, cast, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import delete, insert, select, union_all
+
+from src.core.config import MEALS_LIMIT
+from src.models.users import Meal, MealArchive, MealCounter, MealMonthlyCounter, Ticket, User
+from src.services.utils import make_response_message
+
+MONTH_FORMAT = '%Y-%m'
+
+
+async def retrieve_daily_report(date_from: date, date_to: date, session: AsyncSession
+                                ) -> list[dict[str, Any]] | Response:
+    error = check_period(date_from, date_to)
+    if error is not None:
+        return error
+    # счётчики уже сгруппированы по купону и дню, поэтому итог дня - сумма по его строкам из индекса по дню
+    statement = (
+        select(MealCounter.day, func.sum(MealCounter.count).label('meals'), func.count().label('tickets'))
+        .where(MealCounter.day.between(date_from, date_to), MealCounter.count > 0)
+        .group_by(MealCounter.day)
+        .order_by(MealCounter.day)
+    )
+    result = await session.execute(statement)
+    return [row._asdict() for row in result]
+
+
+async def retrieve_users_daily_report(date_from: date, date_to: date, session: AsyncSession
+                                      ) -> list[dict[str, Any]] | Response:
+    error = check_period(date_from, date_to)
+    if error is not None:
+        return error
+    statement = (
+        select(MealCounter.day, MealCounter.ticket_uuid, Ticket.user_uuid, User.name,
+               MealCounter.count.label('meals'))
+        .join(Ticket, Ticket.uuid == MealCounter.ticket_uuid)
+        .join(User, User.uuid == Ticket.user_uuid)
+        .where(MealCounter.day.between(date_from, date_to), MealCounter.count > 0)
+        .order_by(MealCounter.day, MealCounter.ticket_uuid)
+    )
+    result = await session.execute(statement)
+    return [row._asdict() for row in result]
+
+
+async def retrieve_users_report(month: str, session: AsyncSession) -> list[dict[str, Any]] | Response:
+    try:
+        first_day = parse_month(month)
+    except ValueError:
+        return Response(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        content=make_response_message('Месяц нужно указать в формате ГГГГ-ММ'),
+                        media_type='application/json')
+    # доступно приёмов пищи: лимит за каждый прошедший день месяца, текущий месяц - по сегодня включительно
+    today = datetime.now(timezone.utc).date()
+    last_day = first_day.replace(day=calendar.monthrange(first_day.year, first_day.month)[1])
+    allowed = MEALS_LIMIT * max((min(last_day, today) - first_day).days + 1, 0)
+    statement = (
+        select(MealMonthlyCounter.ticket_uuid, Ticket.user_uuid, User.name,
+               MealMonthlyCounter.meals, MealMonthlyCounter.days)
+        .outerjoin(Ticket, Ticket.uuid == MealMonthlyCounter.ticket_uuid)
+        .outerjoin(User, User.uuid == Ticket.user_uuid)
+        .where(MealMonthlyCounter.month == first_day, MealMonthlyCounter.meals > 0)
+        .order_by(MealMonthlyCounter.ticket_uuid)
+    )
+    result = await session.execute(statement)
+    return [
+        {**row._asdict(), 'utilization': round(row.meals / allowed, 4) if allowed else 0.0}
+        for row in result
+    ]
+
+
+async def rebuild_reports(date_from: date, date_to: date, session: AsyncSession) -> dict[str, Any] | Response:
+    # пересчёт месячных итогов из meals и meals_archive целыми месяцами, покрывающими период;
+    # нужен после ручных правок БД или для проверки итогов, в обычной работе они ведутся при каждой отметке
+    error = check_period(date_from, date_to)
+    if error is not None:
+        return error
+    month_from = date_from.replace(day=1)
+    month_to = next_month(date_to.replace(day=1))
+    dialect = session.bind.dialect.name
+    start = datetime.combine(month_from, time.min, timezone.utc)
+    end = datetime.combine(month_to, time.min, timezone.utc)
+    # отметки, перенесённые в архив, учитываются наравне с текущими
+    meals = union_all(
+        select(Meal.ticket_uuid, Meal.time).where(Meal.time >= start, Meal.time < end),
+        select(MealArchive.ticket_uuid, MealArchive.time).where(MealArchive.time >= start, MealArchive.time < end),
+    ).subquery()
+    day = meal_day_expression(meals.c.time, dialect)
+    per_day = (
+        select(meals.c.ticket_uuid.label('ticket_uuid'), day.label('day'), func.count().label('meals'))
+        .group_by(meals.c.ticket_uuid, day)
+        .subquery()
+    )
+    month = month_expression(per_day.c.day, dialect)
+    await session.execute(delete(MealMonthlyCounter).where(MealMonthlyCounter.month >= month_from,
+                                                           MealMonthlyCounter.month < month_to))
+    tickets = await session.execute(
+        insert(MealMonthlyCounter).from_select(
+            ['month', 'ticket_uuid', 'meals', 'days'],
+            select(month, per_day.c.ticket_uuid, func.sum(per_day.c.meals), func.count())
+            .group_by(month, per_day.c.ticket_uuid),
+        )
+    )
+    await session.commit()
+    return {'date_from': month_from, 'date_to': month_to - timedelta(days=1),
+            'tickets': tickets.rowcount}
+
+
+def check_period(date_from: date, date_to: date) -> Response | None:
+    if date_from > date_to:
+        return Response(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        content=make_response_message('Начало периода позже конца'), media_type='application/json')
+    return None
+
+
+def parse_month(value: str) -> date:
+    return datetime.strptime(value, MONTH_FORMAT).date()
+
+
+def next_month(first_day: date) -> date:
+    return (first_day + timedelta(days=32)).replace(day=1)
+
+
+def meal_day_expression(column: Any, dialect: str) -> Any:
+    if dialect == 'sqlite':
+        return func.date(column)
+    return cast(column, Date)
+
+
+def month_expression(column: Any, dialect: str) -> Any:
+    if dialect == 'sqlite':
+        return func.date(column, 'start of month')
+    return cast(func.date_trunc('month', column), Date)
@@ -0,0 +1,123 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import logging
+import struct
+from datetime import date, datetime, timezone
+from uuid import UUID
+
+from src.core.config import (QR_ACCEPT_UNSIGNED, QR_PAYLOAD_VALIDITY_DAYS, QR_REVOKED_TICKETS, QR_SIGNED_PAYLOADS,
+                             QR_SIGNING_KEYS)
+from src.core.metrics import registry
+from src.services.utils import is_valid_uuid
+
+logger = logging.getLogger(__name__)
+
+# uuid купона, номер ключа, первый и последний день действия (дни от 1970-01-01) и усечённый HMAC-SHA256;
+# 30 байт в base32 - 48 символов из алфавита A-Z2-7, который QR-код кодирует компактным алфавитно-цифровым режимом
+PAYLOAD = struct.Struct('>16sBHH')
+MAC_SIZE = 9
+SIGNED_LENGTH = (PAYLOAD.size + MAC_SIZE) * 8 // 5
+EPOCH = date(1970, 1, 1)
+
+rejected_payloads = registry.counter('qr_payload_rejected_total', 'QR-коды купонов, отклонённые без обращения к БД',
+                                     ('reason',))
+
+
+class PayloadRejected(Exception):
+    def __init__(self, reason: str, message: str) -> None:
+        super().__init__(message)
+        self.reason = reason
+        self.message = message
+
+
+def parse_keys(value: str) -> dict[int, bytes]:
+    # 'номер:секрет,номер:секрет'; номер - от 0 до 255
+    keys = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        key_id, _, secret = item.partition(':')
+        if not secret or not key_id.isdigit() or int(key_id) > 255:
+            raise ValueError(f'Неверный ключ подписи QR-кодов: {key_id!r}')
+        keys[int(key_id)] = secret.encode()
+    return keys
+
+
+class PayloadSigner:
+    # новые коды подписываются первым ключом из списка, остальные ключи только проверяются:
+    # при ротации новый ключ ставится первым, а старый удаляется, когда перепечатаны все купоны.
+    # Набор отозванных купонов живёт в памяти процесса; купоны, удалённые в соседнем воркере
+    # или до перезапуска, отклоняются уже проверкой в БД
+    def __init__(self, enabled: bool, keys: dict[int, bytes], validity_days: int, accept_unsigned: bool,
+                 revoked: set[UUID]) -> None:
+        self.enabled = enabled and bool(keys)
+        self.keys = keys
+        self.key_id = next(iter(keys), None)
+        self.validity_days = max(validity_days, 1)
+        self.accept_unsigned = accept_unsigned or not self.enabled
+        self.revoked = revoked
+
+    def issue(self, ticket_uuid: UUID, today: date | None = None) -> str:
+        if not self.enabled:
+            return str(ticket_uuid)
+        # окно выравнивается по периоду, чтобы код (и его кэш) не менялся каждый день:
+        # код действует с начала текущего периода до конца следующего
+        day = get_day_number(today)
+        valid_from = day - day % self.validity_days
+        valid_until = valid_from + 2 * self.validity_days - 1
+        body = PAYLOAD.pack(ticket_uuid.bytes, self.key_id, valid_from, valid_until)
+        return base64.b32encode(body + self._sign(self.keys[self.key_id], body)).decode()
+
+    def verify(self, data: str, today: date | None = None) -> UUID | None:
+        # возвращает uuid купона или None, если на коде не купон; поддельные, просроченные
+        # и отозванные коды отклоняются исключением PayloadRejected
+        if len(data) != SIGNED_LENGTH:
+            if not is_valid_uuid(data):
+                return None
+            return self.check_unsigned(UUID(data))
+        try:
+            raw = base64.b32decode(data)
+        except (binascii.Error, ValueError):
+            return None
+        body, mac = raw[:PAYLOAD.size], raw[PAYLOAD.size:]
+        uuid_bytes, key_id, valid_from, valid_until = PAYLOAD.unpack(body)
+        key = self.keys.get(key_id)
+        if key is None or not hmac.compare_digest(mac, self._sign(key, body)):
+            self._reject('forged', 'Подпись QR-кода недействительна')
+        if not valid_from <= get_day_number(today) <= valid_until:
+            self._reject('expired', 'Срок действия QR-кода истёк')
+        return self._check_revoked(UUID(bytes=uuid_bytes))
+
+    def check_unsigned(self, ticket_uuid: UUID) -> UUID:
+        # голый uuid - с QR-кода без подписи или уже извлечённый сканером из кода
+        if not self.accept_unsigned:
+            self._reject('unsigned', 'QR-код купона не подписан')
+        return self._check_revoked(ticket_uuid)
+
+    def revoke(self, ticket_uuid: UUID) -> None:
+        self.revoked.add(ticket_uuid)
+
+    def _check_revoked(self, ticket_uuid: UUID) -> UUID:
+        if ticket_uuid in self.revoked:
+            self._reject('revoked', 'Купон отозван')
+        return ticket_uuid
+
+    @staticmethod
+    def _sign(key: bytes, body: bytes) -> bytes:
+        return hmac.new(key, body, hashlib.sha256).digest()[:MAC_SIZE]
+
+    @staticmethod
+    def _reject(reason: str, message: str) -> None:
+        rejected_payloads.inc(reason)
+        raise PayloadRejected(reason, message)
+
+
+def get_day_number(today: date | None = None) -> int:
+    return ((today or datetime.now(timezone.utc).date()) - EPOCH).days
+
+
+signing_keys = parse_keys(QR_SIGNING_KEYS)
+if QR_SIGNED_PAYLOADS and not signing_keys:
+    logger.warning('Подпись QR-кодов отключена: не задан QR_SIGNING_KEYS')
+qr_signer = PayloadSigner(QR_SIGNED_PAYLOADS, signing_keys, QR_PAYLOAD_VALIDITY_DAYS, QR_ACCEPT_UNSIGNED,
+                          {UUID(item.strip()) for item in QR_REVOKED_TICKETS.split(',') if item.strip()})
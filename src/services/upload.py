@@ -0,0 +1,36 @@
+import io
+import mmap
+from contextlib import contextmanager
+from typing import Iterator
+
+from fastapi import UploadFile
+
+
+@contextmanager
+def open_upload(file: UploadFile) -> Iterator[memoryview]:
+    # multipart-парсер уже сложил файл в SpooledTemporaryFile: небольшой файл лежит в BytesIO
+    # и отдаётся через getbuffer(), большой - на диске и отображается через mmap; копий не создаётся
+    spooled = file.file
+    inner = getattr(spooled, '_file', spooled)
+    if isinstance(inner, io.BytesIO):
+        view = inner.getbuffer()
+        try:
+            yield view
+        finally:
+            view.release()
+        return
+    try:
+        spooled.flush()
+        mapped = mmap.mmap(inner.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        buffer = bytearray(file.size or 0)
+        spooled.seek(0)
+        size = spooled.readinto(buffer)
+        yield memoryview(buffer)[:size]
+        return
+    view = memoryview(mapped)
+    try:
+        yield view
+    finally:
+        view.release()
+        mapped.close()
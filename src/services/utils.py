@@ -1,5 +1,12 @@
-import orjson
+import base64
+import io
+import time
 import uuid
+import zipfile
+from datetime import date, datetime, timezone
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Sequence
+
+import orjson
 
 
 def is_valid_uuid(value):
@@ -12,3 +19,79 @@ def is_valid_uuid(value):
 
 def make_response_message(data):
     return orjson.dumps({'message': data})
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags
+
+
+class _ZipBuffer(io.RawIOBase):
+    # поток без seek: zipfile пишет локальные заголовки с data descriptor
+    # и позволяет отдавать архив частями, не собирая его целиком в памяти
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def iter_zip(files: AsyncIterable[tuple[str, bytes]]) -> AsyncIterator[bytes]:
+    buffer = _ZipBuffer()
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        async for name, content in files:
+            archive.writestr(zipfile.ZipInfo(name, date_time), content)
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(orjson.dumps(values, default=dump_default)).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor):
+    values = orjson.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    if not isinstance(values, list):
+        raise ValueError('cursor must be a list')
+    return values
+
+
+def meal_day(time: datetime) -> date:
+    if time.tzinfo is not None:
+        time = time.astimezone(timezone.utc)
+    return time.date()
+
+
+def as_utc(time: datetime) -> datetime:
+    if time.tzinfo is None:
+        return time.replace(tzinfo=timezone.utc)
+    return time.astimezone(timezone.utc)
+
+
+def dump_rows(keys: tuple[str, ...], rows: Iterable[Sequence[Any]]) -> bytes:
+    # строки Core сериализуются сразу в JSON: без объектов ORM, _asdict() и повторной проверки pydantic
+    return orjson.dumps([dict(zip(keys, row)) for row in rows], default=dump_default)
+
+
+def dump_rows_ndjson(keys: tuple[str, ...], rows: Iterable[Sequence[Any]]) -> bytes:
+    return b''.join(orjson.dumps(dict(zip(keys, row)), default=dump_default, option=orjson.OPT_APPEND_NEWLINE)
+                    for row in rows)
+
+
+def dump_default(value: Any) -> Any:
+    # asyncpg возвращает uuid своим подклассом uuid.UUID, который orjson сам не сериализует
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f'Тип {type(value).__name__} не сериализуется в JSON')
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# конфигурация читается при импорте src, поэтому временная БД и настройки задаются до него
+DIRECTORY = tempfile.mkdtemp(prefix='dining_room_test_')
+# TEST_DSN - прогнать тесты на другой пустой БД, например PostgreSQL
+os.environ['DSN'] = os.getenv('TEST_DSN') or f"sqlite+aiosqlite:///{os.path.join(DIRECTORY, 'test.db')}"
+os.environ.update(DECODE_EXECUTOR='thread', RENDER_EXECUTOR='thread', WARMUP_DECODER='0', LOG_QUEUE='0',
+                  ACCESS_LOG_SAMPLE_RATE='0')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def migrate() -> None:
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(ROOT, 'alembic.ini'))
+    config.set_main_option('script_location', os.path.join(ROOT, 'migrations'))
+    command.upgrade(config, 'head')
+
+
+@pytest.fixture(scope='session')
+def client():
+    from fastapi.testclient import TestClient
+
+    migrate()
+    from src.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def ticket(client) -> str:
+    user = client.post('/api/v1/users', json={'name': 'Иванов Иван'}).json()
+    response = client.post('/api/v1/tickets', json={'uuid': user['uuid']})
+    assert response.status_code == 201
+    ticket_uuid = response.json()['uuid']
+    # купон выпущен заранее, иначе /meals/sync отклонит отметки за прошлые дни
+    run(client, update_ticket_created, uuid.UUID(ticket_uuid), datetime.now(timezone.utc) - timedelta(days=60))
+    return ticket_uuid
+
+
+def run(client, func, *args):
+    # сессии привязаны к циклу событий приложения
+    return client.portal.call(func, *args)
+
+
+async def update_ticket_created(ticket_uuid: uuid.UUID, created: datetime) -> None:
+    from sqlalchemy import update
+
+    from src.db.database import async_session
+    from src.models.users import Ticket
+
+    async with async_session() as session:
+        await session.execute(update(Ticket).where(Ticket.uuid == ticket_uuid).values(created=created))
+        await session.commit()
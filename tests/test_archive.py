@@ -0,0 +1,37 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from src.core.config import MEALS_LIMIT
+from src.db.database import async_session
+from src.models.users import MealArchive
+from src.services.archive import archive_meals, get_archive_day
+
+
+def sync(client, ticket, time):
+    record = {'ticket_uuid': ticket, 'time': time.isoformat(), 'client_id': uuid.uuid4().hex}
+    response = client.post('/api/v1/meals/sync', json=[record])
+    assert response.status_code == 200
+    return response.json()[0]['status']
+
+
+def archive(client):
+    async def main():
+        async with async_session() as session:
+            await archive_meals(get_archive_day(0), session, pause=0)
+            return await session.scalar(select(func.count()).select_from(MealArchive))
+
+    # сессии привязаны к циклу событий приложения
+    return client.portal.call(main)
+
+
+def test_archive_keeps_every_meal_and_limit(client, ticket):
+    day = datetime.now(timezone.utc).replace(hour=8, minute=0) - timedelta(days=20)
+    archived = archive(client)
+    for number in range(MEALS_LIMIT):
+        # id удалённой при переносе отметки не должен достаться следующей
+        assert sync(client, ticket, day + timedelta(minutes=number)) == 'created'
+        archived += 1
+        assert archive(client) == archived
+    assert sync(client, ticket, day + timedelta(hours=1)) == 'limit_reached'
@@ -0,0 +1,99 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+
+from src.core.config import MEALS_LIMIT
+from src.services.base import apply_check_ins, record_check_ins
+from src.services.batcher import MealWriteBatcher
+
+
+def make_ticket(client):
+    user = client.post('/api/v1/users', json={'name': 'Сидоров Сидор'}).json()
+    return uuid.UUID(client.post('/api/v1/tickets', json={'uuid': user['uuid']}).json()['uuid'])
+
+
+def meals_of(client, ticket_uuid):
+    return [meal for meal in client.get('/api/v1/meals').json() if meal['ticket_uuid'] == str(ticket_uuid)]
+
+
+class Recorder:
+    # apply из base.py, который запоминает транзакции и может уронить пачку с заданным купоном
+    def __init__(self, failing=None):
+        self.sessions = []
+        self.failing = failing
+
+    async def apply(self, ticket_uuids, session, time):
+        if session not in self.sessions:
+            self.sessions.append(session)
+        results = await apply_check_ins(ticket_uuids, session, time)
+        if self.failing in ticket_uuids:
+            raise RuntimeError('отметка не записывается')
+        return results
+
+
+def run_batch(client, recorder, groups, max_size=100, max_delay=10.0, stop=False):
+    async def main():
+        batcher = MealWriteBatcher(True, max_size, max_delay, recorder.apply, record_check_ins)
+        batcher.start()
+        now = datetime.now(timezone.utc)
+        tasks = [asyncio.create_task(batcher.submit(group, now)) for group in groups]
+        started = time.perf_counter()
+        if stop:
+            await asyncio.sleep(0)
+            await batcher.stop()
+        results = await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 5)
+        elapsed = time.perf_counter() - started
+        await batcher.stop()
+        return results, elapsed
+
+    return client.portal.call(main)
+
+
+def test_flush_by_size(client):
+    tickets = [make_ticket(client) for _ in range(3)]
+    recorder = Recorder()
+    results, elapsed = run_batch(client, recorder, [[ticket] for ticket in tickets], max_size=3)
+    assert results == [['created']] * 3
+    assert len(recorder.sessions) == 1
+    # пачка записана по заполнению, не дожидаясь max_delay
+    assert elapsed < 5
+
+
+def test_flush_by_delay(client):
+    ticket = make_ticket(client)
+    results, elapsed = run_batch(client, Recorder(), [[ticket]], max_delay=0.2)
+    assert results == [['created']]
+    assert elapsed >= 0.2
+
+
+def test_each_caller_gets_own_result(client):
+    ticket, other = make_ticket(client), make_ticket(client)
+    recorder = Recorder()
+    groups = [[ticket]] * (MEALS_LIMIT + 1) + [[other, uuid.uuid4()]]
+    results, _ = run_batch(client, recorder, groups, max_size=MEALS_LIMIT + 3)
+    assert results == [['created']] * MEALS_LIMIT + [['limit_reached'], ['created', 'not_found']]
+    assert len(recorder.sessions) == 1
+    assert len(meals_of(client, ticket)) == MEALS_LIMIT
+
+
+def test_fallback_to_one_transaction_per_item(client):
+    ticket, failing = make_ticket(client), make_ticket(client)
+    recorder = Recorder(failing=failing)
+    results, _ = run_batch(client, recorder, [[ticket], [failing]], max_size=2)
+    assert results[0] == ['created']
+    assert isinstance(results[1], RuntimeError)
+    # пачка откатилась целиком, удачная отметка записана своей транзакцией ровно один раз
+    assert len(recorder.sessions) == 3
+    assert len(meals_of(client, ticket)) == 1
+    assert meals_of(client, failing) == []
+
+
+def test_stop_writes_pending(client):
+    tickets = [make_ticket(client) for _ in range(2)]
+    results, elapsed = run_batch(client, Recorder(), [[ticket] for ticket in tickets], stop=True)
+    assert results == [['created']] * 2
+    assert elapsed < 5
+    for ticket in tickets:
+        assert len(meals_of(client, ticket)) == 1
+
@@ -0,0 +1,30 @@
+import csv
+import io
+import zipfile
+
+from src.core.config import BULK_RENDER_CHUNK
+from src.services.qr import decode
+
+
+def test_bulk_zip(client):
+    names = [f'Участник {number}' for number in range(BULK_RENDER_CHUNK * 2 + 5)]
+    response = client.post('/api/v1/tickets/bulk', params={'format': 'png1'}, json={'names': names})
+    assert response.status_code == 201 and response.headers['content-type'] == 'application/zip'
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    rows = list(csv.DictReader(io.StringIO(archive.read('tickets.csv').decode())))
+    assert [row['name'] for row in rows] == names
+    # картинки идут в порядке манифеста, хотя пачки рендерятся параллельно
+    assert archive.namelist() == ['tickets.csv'] + [f"{row['ticket_uuid']}.png" for row in rows]
+    for row in rows[::BULK_RENDER_CHUNK // 2]:
+        assert decode(archive.read(f"{row['ticket_uuid']}.png")).data == row['ticket_uuid']
+    issued = {ticket['uuid']: ticket['user_uuid'] for ticket in client.get('/api/v1/tickets').json()}
+    assert all(issued[row['ticket_uuid']] == row['user_uuid'] for row in rows)
+    assert client.post('/api/v1/meals/checkin', json={'uuid': rows[-1]['ticket_uuid']}).status_code == 200
+
+
+def test_svg_and_empty(client):
+    response = client.post('/api/v1/tickets/bulk', params={'format': 'svg'}, json={'names': ['Один']})
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    name, = [name for name in archive.namelist() if name != 'tickets.csv']
+    assert name.endswith('.svg') and archive.read(name).startswith(b'<svg')
+    assert client.post('/api/v1/tickets/bulk', json={'names': []}).status_code == 422
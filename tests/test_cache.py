@@ -0,0 +1,44 @@
+import asyncio
+import threading
+
+from src.services.cache import BytesLRUCache
+
+
+def test_memory_eviction():
+    cache = BytesLRUCache(10)
+    cache.set('a', b'12345')
+    cache.set('b', b'12345')
+    assert cache.get('a') == b'12345'
+    cache.set('c', b'12345')
+    # вытесняется давно не использованная запись
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    cache.set('big', b'x' * 11)
+    assert 'big' not in cache and cache.size == 10
+
+
+def test_disk_tier_off_event_loop(tmp_path, monkeypatch):
+    threads = []
+    for name in ('_read', '_write'):
+        original = getattr(BytesLRUCache, name)
+
+        def recording(self, *args, original=original):
+            threads.append(threading.get_ident())
+            return original(self, *args)
+
+        monkeypatch.setattr(BytesLRUCache, name, recording)
+
+    async def main():
+        loop_thread = threading.get_ident()
+        cache = BytesLRUCache(1024, str(tmp_path))
+        await cache.store_many([('a', b'first'), ('b', b'second')])
+        # новый процесс: памяти нет, записи читаются с диска
+        restarted = BytesLRUCache(1024, str(tmp_path))
+        assert restarted.get('a') is None and 'a' not in restarted
+        assert await restarted.exists('a') and not await restarted.exists('missing')
+        assert await restarted.load_many(['a', 'missing', 'b']) == [b'first', None, b'second']
+        assert restarted.get('a') == b'first'
+        return loop_thread
+
+    loop_thread = asyncio.run(main())
+    assert threads and loop_thread not in threads
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['a', 'b']
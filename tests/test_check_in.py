@@ -0,0 +1,84 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.config import MEALS_LIMIT
+from src.services.qr import render
+from src.services.signing import qr_signer
+
+
+def check_in(client, ticket_uuid):
+    return client.post('/api/v1/meals/checkin', json={'uuid': ticket_uuid})
+
+
+def meals_of(client, ticket_uuid):
+    return [meal for meal in client.get('/api/v1/meals').json() if meal['ticket_uuid'] == ticket_uuid]
+
+
+def test_limit_per_day(client, ticket):
+    statuses = [check_in(client, ticket).status_code for _ in range(MEALS_LIMIT + 1)]
+    assert statuses == [200] * MEALS_LIMIT + [403]
+    assert len(meals_of(client, ticket)) == MEALS_LIMIT
+
+
+def test_unknown_ticket(client):
+    assert check_in(client, str(uuid.uuid4())).status_code == 404
+
+
+def test_concurrent_scans_respect_limit(client, ticket):
+    with ThreadPoolExecutor(8) as pool:
+        statuses = sorted(pool.map(lambda _: check_in(client, ticket).status_code, range(8)))
+    assert statuses == [200] * MEALS_LIMIT + [403] * (8 - MEALS_LIMIT)
+    assert len(meals_of(client, ticket)) == MEALS_LIMIT
+
+
+def test_batch_statuses(client, ticket):
+    unknown = str(uuid.uuid4())
+    response = client.post('/api/v1/meals/checkin',
+                           json=[{'uuid': ticket}] * (MEALS_LIMIT + 1) + [{'uuid': unknown}])
+    assert response.status_code == 200
+    assert [item['status'] for item in response.json()] == (
+        ['created'] * MEALS_LIMIT + ['limit_reached', 'not_found']
+    )
+
+
+def test_raw_qr_payload(client, ticket):
+    assert client.post('/api/v1/meals/checkin', json={'data': ticket}).status_code == 200
+    assert client.post('/api/v1/meals/checkin', json={'data': 'hello'}).status_code == 422
+    assert client.post('/api/v1/meals/checkin', json={'uuid': ticket, 'data': ticket}).status_code == 422
+    response = client.post('/api/v1/meals/checkin', json=[{'data': ticket}, {'data': 'hello'}])
+    assert [item['status'] for item in response.json()] == ['created', 'invalid']
+
+
+def test_revoked_ticket(client, ticket):
+    qr_signer.revoke(uuid.UUID(ticket))
+    assert check_in(client, ticket).status_code == 403
+    response = client.post('/api/v1/meals/checkin', json=[{'uuid': ticket}, {'data': ticket}])
+    assert response.json() == [{'uuid': None, 'status': 'rejected'}] * 2
+    assert meals_of(client, ticket) == []
+
+
+def test_decode_path_on_every_outcome(client, ticket):
+    def scan(content):
+        response = client.post('/api/v1/meals', files={'file': ('scan.png', content, 'image/png')})
+        assert response.headers['X-Decode-Path'] in ('fast', 'roi', 'full', 'none')
+        return response.status_code
+
+    code = render(qr_signer.issue(uuid.UUID(ticket)), 'png')
+    assert [scan(code) for _ in range(MEALS_LIMIT + 1)] == [200] * MEALS_LIMIT + [403]
+    assert scan(render(qr_signer.issue(uuid.uuid4()), 'png')) == 404
+    assert scan(render('hello', 'png')) == 422
+    assert scan(b'not an image') == 422
+
+
+def test_delete_ticket_and_user_with_meals(client, ticket):
+    assert check_in(client, ticket).status_code == 200
+    assert client.request('DELETE', '/api/v1/tickets', json={'uuid': ticket}).status_code == 204
+    assert meals_of(client, ticket) == []
+
+    user = client.post('/api/v1/users', json={'name': 'Сидоров Сидор'}).json()
+    other = client.post('/api/v1/tickets', json={'uuid': user['uuid']}).json()['uuid']
+    assert check_in(client, other).status_code == 200
+    assert client.request('DELETE', '/api/v1/users', json={'uuid': user['uuid']}).status_code == 204
+    assert meals_of(client, other) == []
+    # удалённый купон отозван
+    assert check_in(client, other).status_code == 403
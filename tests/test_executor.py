@@ -0,0 +1,47 @@
+import asyncio
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from src.services.executor import BoundedExecutor, ExecutorBusyError
+
+
+def test_cancelled_request_keeps_its_slot():
+    gate = threading.Event()
+
+    async def main():
+        executor = BoundedExecutor('test', 'thread', 1, 0)
+        request = asyncio.create_task(executor.run(gate.wait, 5))
+        await asyncio.sleep(0.05)
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        # задача ещё выполняется в потоке, поэтому новая отклоняется
+        assert executor.pending == 1
+        with pytest.raises(ExecutorBusyError):
+            await executor.run(abs, -1)
+        gate.set()
+        for _ in range(100):
+            if not executor.pending:
+                break
+            await asyncio.sleep(0.01)
+        result = await executor.run(abs, -1)
+        executor.shutdown()
+        return result
+
+    assert asyncio.run(main()) == 1
+
+
+def test_broken_process_pool_is_replaced():
+    async def main():
+        executor = BoundedExecutor('test', 'process', 1, 0)
+        with pytest.raises(BrokenProcessPool):
+            await executor.run(os._exit, 1)
+        assert executor._executor is None and executor.pending == 0
+        result = await executor.run(abs, -1)
+        executor.shutdown()
+        return result
+
+    assert asyncio.run(main()) == 1
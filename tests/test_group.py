@@ -0,0 +1,49 @@
+import uuid
+
+import cv2
+import numpy as np
+
+from src.core.config import MEALS_LIMIT
+from src.services.qr import render
+
+
+def make_ticket(client):
+    user = client.post('/api/v1/users', json={'name': 'Участник группы'}).json()
+    return client.post('/api/v1/tickets', json={'uuid': user['uuid']}).json()['uuid']
+
+
+def make_group_photo(data):
+    # до шести кодов по 300 пикселей на одном снимке
+    canvas = np.full((800, 1200), 255, np.uint8)
+    for number, item in enumerate(data):
+        code = cv2.imdecode(np.frombuffer(render(item, 'png'), np.uint8), cv2.IMREAD_GRAYSCALE)
+        left, top = 50 + number % 3 * 380, 50 + number // 3 * 380
+        canvas[top:top + 300, left:left + 300] = cv2.resize(code, (300, 300), interpolation=cv2.INTER_NEAREST)
+    return cv2.imencode('.png', canvas)[1].tobytes()
+
+
+def check_in_group(client, content):
+    return client.post('/api/v1/meals/group', files={'file': ('group.png', content, 'image/png')})
+
+
+def test_group_check_in(client):
+    fresh, exhausted, unknown = make_ticket(client), make_ticket(client), str(uuid.uuid4())
+    for _ in range(MEALS_LIMIT):
+        client.post('/api/v1/meals/checkin', json={'uuid': exhausted})
+    response = check_in_group(client, make_group_photo([fresh, exhausted, unknown, 'hello', fresh]))
+    assert response.status_code == 200
+    body = response.json()
+    assert body['undecoded'] == 0
+    statuses = {}
+    for item in body['results']:
+        statuses.setdefault(item['data'], []).append(item['status'])
+    # коды возвращаются в порядке обнаружения, поэтому повтор купона - второй из двух
+    assert statuses == {fresh: ['created', 'duplicate'], exhausted: ['limit_reached'], unknown: ['not_found'],
+                        'hello': ['invalid']}
+    meals = [meal for meal in client.get('/api/v1/meals').json() if meal['ticket_uuid'] == fresh]
+    assert len(meals) == 1
+
+
+def test_no_codes(client):
+    blank = cv2.imencode('.png', np.full((400, 400), 255, np.uint8))[1].tobytes()
+    assert check_in_group(client, blank).status_code == 422
@@ -0,0 +1,101 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+
+from src.core.config import MEALS_LIMIT
+from src.db.database import async_session, engine
+from src.services import base
+from src.services.index import TicketIndex, create_ticket_index
+from src.services.utils import meal_day
+
+
+def today():
+    return meal_day(datetime.now(timezone.utc))
+
+
+def make_index(count=0):
+    index = TicketIndex(True)
+    tickets = [(uuid.uuid4(), uuid.uuid4()) for _ in range(count)]
+    index.add_many(tickets)
+    index.ready = True
+    return index, tickets
+
+
+def test_warm_from_database(client, ticket):
+    assert client.post('/api/v1/meals/checkin', json={'uuid': ticket}).status_code == 200
+    owner = next(item['user_uuid'] for item in client.get('/api/v1/tickets').json() if item['uuid'] == ticket)
+
+    async def warm():
+        index = TicketIndex(True)
+        async with async_session() as session:
+            await index.warm(session)
+        return index
+
+    index = client.portal.call(warm)
+    assert index.ready
+    assert str(index.owner(uuid.UUID(ticket))) == owner
+    assert index.meals(uuid.UUID(ticket)) == 1
+    assert len(index) == len(client.get('/api/v1/tickets').json())
+
+
+def test_add_many_and_remove():
+    index, tickets = make_index(500)
+    assert len(index) == 500
+    assert all(ticket_uuid in index and index.owner(ticket_uuid) == owner for ticket_uuid, owner in tickets)
+    # повторная пачка обновляет записи, а не дублирует их
+    new_owner = uuid.uuid4()
+    index.add_many([(tickets[0][0], new_owner), (uuid.uuid4(), uuid.uuid4())])
+    assert len(index) == 501 and index.owner(tickets[0][0]) == new_owner
+    for ticket_uuid, _ in tickets[::2]:
+        index.remove(ticket_uuid)
+    assert len(index) == 251
+    assert all((ticket_uuid in index) == bool(number % 2) for number, (ticket_uuid, _) in enumerate(tickets))
+    index.add(tickets[0][0], tickets[0][1])
+    assert tickets[0][0] in index and index.meals(tickets[0][0]) == 0
+
+
+def test_limit_and_day_roll_over():
+    index, [(ticket_uuid, _)] = make_index(1)
+    for _ in range(MEALS_LIMIT):
+        assert index.check(ticket_uuid) is None
+        index.record_meal(ticket_uuid, today())
+    assert index.check(ticket_uuid) == 'limit_reached'
+    # отметки за другие дни счётчик текущего дня не меняют
+    index.record_meal(ticket_uuid, today() - timedelta(days=1))
+    index.cancel_meal(ticket_uuid, today() - timedelta(days=1))
+    assert index.meals(ticket_uuid) == MEALS_LIMIT
+    index.day = today() - timedelta(days=1)
+    assert index.check(ticket_uuid) is None
+    assert index.meals(ticket_uuid) == 0
+
+
+def test_unknown_ticket_without_query(client, monkeypatch):
+    index, [(ticket_uuid, _)] = make_index(1)
+    for _ in range(MEALS_LIMIT):
+        index.record_meal(ticket_uuid, today())
+    monkeypatch.setattr(base, 'ticket_index', index)
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    async def check():
+        async with async_session() as session:
+            return await base.apply_check_ins([uuid.uuid4(), ticket_uuid], session, datetime.now(timezone.utc))
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', count)
+    try:
+        assert client.portal.call(check) == ['not_found', 'limit_reached']
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', count)
+    assert statements == []
+
+
+def test_disabled_with_several_workers():
+    assert create_ticket_index(True, 1).enabled
+    assert not create_ticket_index(True, 2).enabled
+    assert not create_ticket_index(False, 1).enabled
+    index = create_ticket_index(True, 2)
+    index.add(uuid.uuid4(), uuid.uuid4())
+    assert len(index) == 0 and not index.ready
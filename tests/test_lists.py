@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from src.services.utils import encode_cursor
+
+
+def walk(client, path, limit):
+    items, cursor = [], None
+    while True:
+        params = {'limit': limit, **({'cursor': cursor} if cursor else {})}
+        response = client.get(path, params=params)
+        assert response.status_code == 200
+        items += response.json()
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            return items
+        assert len(response.json()) == limit
+
+
+@pytest.mark.parametrize('path', ['/api/v1/tickets', '/api/v1/meals'])
+def test_pages_match_stream(client, path):
+    # купоны из одной пачки выпущены в одно время, страницы делятся по второй колонке ключа
+    names = [f'Страница {number}' for number in range(12)]
+    client.post('/api/v1/tickets/bulk', params={'format': 'png1'}, json={'names': names})
+    tickets = client.get('/api/v1/tickets', params={'format': 'ndjson'}).text.splitlines()[-3:]
+    for line in tickets:
+        client.post('/api/v1/meals/checkin', json={'uuid': json.loads(line)['uuid']})
+
+    response = client.get(path, params={'format': 'ndjson'})
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    streamed = [json.loads(line) for line in response.text.splitlines()]
+    paged = walk(client, path, 5)
+    assert paged == streamed
+    assert len({tuple(item.values()) for item in paged}) == len(paged)
+    limited = client.get(path, params={'format': 'ndjson', 'limit': 2}).text.splitlines()
+    assert [json.loads(line) for line in limited] == streamed[:2]
+
+
+@pytest.mark.parametrize('cursor', ['???', encode_cursor({'id': 1}), encode_cursor([1, 2]), encode_cursor(['x']),
+                                    encode_cursor(['not a date', 'not a uuid'])])
+def test_bad_cursor(client, cursor):
+    assert client.get('/api/v1/meals', params={'cursor': cursor}).status_code == 422
+    assert client.get('/api/v1/tickets', params={'cursor': cursor}).status_code == 422
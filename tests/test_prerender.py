@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import uuid
+
+from sqlalchemy import select
+
+from src.api.v1.schemas import TicketUUID
+from src.db.database import async_read_session
+from src.models.users import Ticket
+from src.services import base, prerender
+from src.services.cache import make_cache_key, qr_cache
+from src.services.prerender import QRPrerenderer
+from src.services.qr import get_render_params, render
+from src.services.signing import qr_signer
+
+
+def test_request_waits_for_prerendered_code(client, ticket, monkeypatch):
+    started, gate = threading.Event(), threading.Event()
+    calls = []
+
+    def blocked_render(payload, fmt):
+        # рендер в потоке пула держится, пока запрос за кодом не встанет в ожидание
+        calls.append(fmt)
+        started.set()
+        gate.wait(5)
+        return render(payload, fmt)
+
+    # второй обработчик получает тот же купон и ждёт первого, а не рисует код ещё раз
+    prerenderer = QRPrerenderer(True, ('png',), 2, 10, False)
+    monkeypatch.setattr(prerender, 'render', blocked_render)
+    monkeypatch.setattr(base, 'render', blocked_render)
+    monkeypatch.setattr(base, 'qr_prerenderer', prerenderer)
+    ticket_uuid = uuid.UUID(ticket)
+    key = make_cache_key(qr_signer.issue(ticket_uuid), get_render_params('png'))
+
+    async def main():
+        prerenderer.start()
+        try:
+            prerenderer.submit([ticket_uuid])
+            prerenderer.submit([ticket_uuid])
+            await asyncio.to_thread(started.wait, 5)
+            async with async_read_session() as session:
+                request = asyncio.create_task(base.create_qr(TicketUUID(uuid=ticket_uuid), session))
+                await asyncio.sleep(0.1)
+                assert not request.done()
+                gate.set()
+                response = await request
+        finally:
+            gate.set()
+            await prerenderer.stop()
+        return response
+
+    response = client.portal.call(main)
+    assert response.status_code == 200
+    assert response.body == qr_cache.get(key)
+    assert calls == ['png']
+
+
+def test_warm_up_pages_through_all_tickets(client, ticket, monkeypatch):
+    monkeypatch.setattr(prerender, 'WARM_UP_PAGE', 2)
+
+    async def warm(limit):
+        prerenderer = QRPrerenderer(True, ('png',), 1, 0, True, limit)
+        prerenderer._queue = asyncio.Queue()
+        await prerenderer._warm_up()
+        queued = []
+        while not prerenderer._queue.empty():
+            queued.append(prerenderer._queue.get_nowait().ticket_uuid)
+        async with async_read_session() as session:
+            expected = (await session.scalars(
+                select(Ticket.uuid).order_by(Ticket.created.desc(), Ticket.uuid.desc()))).all()
+        return queued, expected
+
+    user = client.post('/api/v1/users', json={'name': 'Петров Пётр'}).json()
+    assert client.post('/api/v1/tickets', json={'uuid': user['uuid']}).status_code == 201
+    queued, expected = client.portal.call(warm, 0)
+    assert len(expected) >= 3 and queued == expected
+    queued, expected = client.portal.call(warm, 3)
+    assert queued == expected[:3]
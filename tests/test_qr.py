@@ -0,0 +1,87 @@
+import uuid
+
+import cv2
+import numpy as np
+import pytest
+
+from src.services import qr
+
+DATA = str(uuid.UUID(int=5))
+
+
+def make_photo(size, code_size, data=DATA):
+    # QR-код размером code_size пикселей на белом снимке size x size
+    code = cv2.imdecode(np.frombuffer(qr.render(data, 'png'), np.uint8), cv2.IMREAD_GRAYSCALE)
+    canvas = np.full((size, size), 255, np.uint8)
+    canvas[100:100 + code_size, 100:100 + code_size] = cv2.resize(code, (code_size, code_size),
+                                                                   interpolation=cv2.INTER_NEAREST)
+    return cv2.imencode('.png', canvas)[1].tobytes()
+
+
+@pytest.fixture(autouse=True)
+def forget_region():
+    # область кода с прошлого скана хранится в потоке
+    qr._local.__dict__.pop('region', None)
+
+
+def test_fast_path_on_downscaled_photo():
+    assert qr.decode(make_photo(4000, 800)) == (DATA, 'fast')
+
+
+def test_full_resolution_then_region():
+    # мелкий код теряется при уменьшении и находится на полном размере,
+    # а следующий скан с кодом на том же месте распознаётся по области прошлого
+    photo = make_photo(4000, 150)
+    assert qr.decode(photo) == (DATA, 'full')
+    assert qr.decode(photo) == (DATA, 'roi')
+
+
+def test_small_photo_is_not_downscaled():
+    assert qr.decode(make_photo(600, 300)) == (DATA, 'full')
+
+
+def test_nothing_found():
+    assert qr.decode(b'not an image') == ('', 'none')
+    assert qr.decode(cv2.imencode('.png', np.full((200, 200), 255, np.uint8))[1].tobytes()) == ('', 'none')
+
+
+def test_opencv_error_is_a_miss():
+    class Failing:
+        def detectAndDecode(self, image):
+            raise cv2.error('detector failed')
+
+    assert qr.detect_and_decode(Failing(), np.zeros((10, 10), np.uint8)) == ('', None)
+
+
+@pytest.mark.parametrize('fmt', ['png', 'png1'])
+def test_png_round_trip(fmt):
+    content = qr.render(DATA, fmt)
+    assert content.startswith(qr.PNG_SIGNATURE)
+    assert qr.decode(content) == (DATA, 'full')
+
+
+def test_png1_matches_png():
+    png = cv2.imdecode(np.frombuffer(qr.render(DATA, 'png'), np.uint8), cv2.IMREAD_GRAYSCALE)
+    png1 = cv2.imdecode(np.frombuffer(qr.render(DATA, 'png1'), np.uint8), cv2.IMREAD_GRAYSCALE)
+    assert png.shape == png1.shape
+    # те же модули кода: тёмные пиксели совпадают
+    assert ((png < 128) == (png1 < 128)).all()
+
+
+def test_svg():
+    import xml.etree.ElementTree as ElementTree
+
+    matrix = qr.get_matrix(DATA)
+    root = ElementTree.fromstring(qr.render(DATA, 'svg'))
+    assert root.get('viewBox') == f'0 0 {len(matrix)} {len(matrix)}'
+    path = root.find('{http://www.w3.org/2000/svg}path').get('d')
+    assert path.count('M') == sum(map(sum, matrix))
+
+
+def test_parallel_render_keeps_data_apart():
+    from concurrent.futures import ThreadPoolExecutor
+
+    data = [str(uuid.UUID(int=number)) for number in range(1, 33)]
+    with ThreadPoolExecutor(8) as pool:
+        images = list(pool.map(lambda item: qr.render(item, 'png1'), data))
+    assert [qr.decode(image).data for image in images] == data
@@ -0,0 +1,31 @@
+import uuid
+
+
+def get_qr(client, ticket, fmt='png', **headers):
+    return client.post('/api/v1/qr', params={'format': fmt}, json={'uuid': ticket}, headers=headers)
+
+
+def test_etag_and_not_modified(client, ticket):
+    first = get_qr(client, ticket)
+    assert first.status_code == 200 and first.headers['content-type'] == 'image/png'
+    etag = first.headers['ETag']
+    second = get_qr(client, ticket)
+    assert second.headers['ETag'] == etag and second.content == first.content
+    cached = get_qr(client, ticket, **{'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.content == b'' and cached.headers['ETag'] == etag
+    assert get_qr(client, ticket, **{'If-None-Match': '"other", ' + etag}).status_code == 304
+    assert get_qr(client, ticket, **{'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_unknown_ticket(client):
+    assert get_qr(client, str(uuid.uuid4())).status_code == 404
+
+
+def test_formats(client, ticket):
+    responses = {fmt: get_qr(client, ticket, fmt) for fmt in ('png', 'png1', 'svg')}
+    assert {fmt: response.headers['content-type'] for fmt, response in responses.items()} == {
+        'png': 'image/png', 'png1': 'image/png', 'svg': 'image/svg+xml'}
+    assert responses['svg'].content.startswith(b'<svg')
+    # у каждого формата своя запись кэша и свой ETag
+    assert len({response.headers['ETag'] for response in responses.values()}) == 3
+    assert get_qr(client, ticket, 'gif').status_code == 422
@@ -0,0 +1,25 @@
+from datetime import datetime, timezone
+
+
+def check_in(client, ticket):
+    return client.post('/api/v1/meals/checkin', json={'uuid': ticket}).status_code
+
+
+def test_daily_reports(client, ticket):
+    today = datetime.now(timezone.utc).date().isoformat()
+    period = {'date_from': today, 'date_to': today}
+    before = {row['day']: row for row in client.get('/api/v1/reports/daily', params=period).json()}
+    totals = before.get(today, {'meals': 0, 'tickets': 0})
+    assert check_in(client, ticket) == 200
+    assert check_in(client, ticket) == 200
+
+    daily, = client.get('/api/v1/reports/daily', params=period).json()
+    assert daily == {'day': today, 'meals': totals['meals'] + 2, 'tickets': totals['tickets'] + 1}
+    users = client.get('/api/v1/reports/users/daily', params=period).json()
+    row, = [row for row in users if row['ticket_uuid'] == ticket]
+    assert row['day'] == today and row['meals'] == 2 and row['name'] == 'Иванов Иван'
+
+
+def test_period_order(client):
+    params = {'date_from': '2026-02-01', 'date_to': '2026-01-01'}
+    assert client.get('/api/v1/reports/users/daily', params=params).status_code == 422
@@ -0,0 +1,45 @@
+import uuid
+from datetime import date, timedelta
+
+import pytest
+
+from src.services.signing import PayloadRejected, PayloadSigner, SIGNED_LENGTH
+
+
+def make_signer(keys=None, accept_unsigned=False):
+    return PayloadSigner(True, keys or {2: b'new', 1: b'old'}, 30, accept_unsigned, set())
+
+
+def rejected(signer, data, today=None):
+    with pytest.raises(PayloadRejected) as error:
+        signer.verify(data, today)
+    return error.value.reason
+
+
+def test_round_trip():
+    signer, ticket_uuid = make_signer(), uuid.uuid4()
+    payload = signer.issue(ticket_uuid)
+    assert len(payload) == SIGNED_LENGTH
+    assert signer.verify(payload) == ticket_uuid
+
+
+def test_rotated_key_still_verifies():
+    ticket_uuid = uuid.uuid4()
+    payload = make_signer({1: b'old'}).issue(ticket_uuid)
+    assert make_signer().verify(payload) == ticket_uuid
+
+
+def test_rejects_forged_expired_revoked_unsigned():
+    signer, ticket_uuid = make_signer(), uuid.uuid4()
+    payload = signer.issue(ticket_uuid)
+    assert rejected(signer, payload[:-1] + ('A' if payload[-1] != 'A' else 'B')) == 'forged'
+    assert rejected(make_signer({3: b'other'}), payload) == 'forged'
+    assert rejected(signer, payload, date.today() + timedelta(days=90)) == 'expired'
+    assert rejected(signer, str(ticket_uuid)) == 'unsigned'
+    signer.revoke(ticket_uuid)
+    assert rejected(signer, payload) == 'revoked'
+
+
+def test_not_a_ticket():
+    assert make_signer().verify('hello') is None
+    assert make_signer(accept_unsigned=True).verify(str(uuid.UUID(int=1))) == uuid.UUID(int=1)
@@ -0,0 +1,68 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from src.core.config import MEALS_LIMIT, SYNC_MAX_AGE_DAYS
+from src.services.signing import qr_signer
+
+
+def make_records(ticket, count, time):
+    return [{'ticket_uuid': ticket, 'time': (time + timedelta(minutes=number)).isoformat(),
+             'client_id': uuid.uuid4().hex} for number in range(count)]
+
+
+def sync(client, records):
+    response = client.post('/api/v1/meals/sync', json=records)
+    assert response.status_code == 200
+    return [item['status'] for item in response.json()]
+
+
+def test_replay_is_idempotent(client, ticket):
+    records = make_records(ticket, 1, datetime.now(timezone.utc) - timedelta(days=1))
+    assert sync(client, records) == ['created']
+    assert sync(client, records) == ['duplicate']
+
+
+def test_duplicate_client_id_in_batch(client, ticket):
+    record, = make_records(ticket, 1, datetime.now(timezone.utc) - timedelta(days=2))
+    assert sync(client, [record, record]) == ['created', 'duplicate']
+
+
+def test_limit_by_scan_day(client, ticket):
+    day = datetime.now(timezone.utc).replace(hour=8, minute=0) - timedelta(days=3)
+    records = make_records(ticket, MEALS_LIMIT + 1, day) + make_records(ticket, 1, day + timedelta(days=1))
+    assert sync(client, records) == ['created'] * MEALS_LIMIT + ['limit_reached', 'created']
+
+
+def test_unknown_ticket(client):
+    assert sync(client, make_records(str(uuid.uuid4()), 1, datetime.now(timezone.utc))) == ['not_found']
+
+
+def test_raw_qr_payload_and_revoked(client, ticket):
+    time = datetime.now(timezone.utc) - timedelta(days=4)
+    record, = make_records(ticket, 1, time)
+    record['data'] = record.pop('ticket_uuid')
+    garbage = {'data': 'hello', 'time': time.isoformat(), 'client_id': uuid.uuid4().hex}
+    assert sync(client, [record, garbage]) == ['created', 'invalid']
+    qr_signer.revoke(uuid.UUID(ticket))
+    assert sync(client, make_records(ticket, 1, time + timedelta(hours=1))) == ['rejected']
+
+
+def test_scan_time_out_of_bounds(client, ticket):
+    now = datetime.now(timezone.utc)
+    future = make_records(ticket, 1, now + timedelta(days=1))
+    future += make_records(ticket, 1, datetime(2099, 1, 1, tzinfo=timezone.utc))
+    assert sync(client, future) == ['invalid', 'invalid']
+    past = make_records(ticket, 1, datetime(1970, 1, 2, tzinfo=timezone.utc))
+    past += make_records(ticket, 1, now - timedelta(days=SYNC_MAX_AGE_DAYS, hours=1))
+    assert sync(client, past) == ['invalid', 'invalid']
+    period = {'date_from': '1970-01-01', 'date_to': '2100-01-01'}
+    rows = client.get('/api/v1/reports/users/daily', params=period).json()
+    assert [row for row in rows if row['ticket_uuid'] == ticket] == []
+
+
+def test_scan_before_ticket_issued(client):
+    user = client.post('/api/v1/users', json={'name': 'Петров Пётр'}).json()
+    ticket = client.post('/api/v1/tickets', json={'uuid': user['uuid']}).json()['uuid']
+    now = datetime.now(timezone.utc)
+    records = make_records(ticket, 1, now - timedelta(days=1)) + make_records(ticket, 1, now)
+    assert sync(client, records) == ['invalid', 'created']
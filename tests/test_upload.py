@@ -0,0 +1,54 @@
+import asyncio
+
+from src.core.config import MAX_IMAGE_SIZE
+from src.core.middleware import MULTIPART_OVERHEAD, BodySizeLimitMiddleware
+
+
+def upload(client, content, path='/api/v1/meals'):
+    return client.post(path, files={'file': ('scan.png', content, 'image/png')})
+
+
+def test_body_over_limit(client):
+    content = b'\x00' * (MAX_IMAGE_SIZE + MULTIPART_OVERHEAD + 1)
+    assert upload(client, content).status_code == 413
+    assert upload(client, content, '/api/v1/meals/group').status_code == 413
+
+
+def test_file_over_limit_within_overhead(client):
+    # тело проходит по размеру, но сам файл больше MAX_IMAGE_SIZE
+    assert upload(client, b'\x00' * (MAX_IMAGE_SIZE + 1)).status_code == 413
+
+
+def test_empty_and_unreadable_file(client):
+    assert upload(client, b'').status_code == 422
+    assert upload(client, b'not an image').status_code == 422
+
+
+def run_middleware(chunks, max_size=10, path='/upload'):
+    # тело приходит частями без Content-Length, как при chunked-передаче
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': number < len(chunks) - 1}
+                for number, chunk in enumerate(chunks)]
+    sent = []
+
+    async def app(scope, receive, send):
+        while (await receive()).get('more_body'):
+            pass
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'ok'})
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': path, 'headers': []}
+    asyncio.run(BodySizeLimitMiddleware(app, max_size, ('/upload',))(scope, receive, send))
+    return sent[0]['status']
+
+
+def test_chunked_body():
+    limit = 10 + MULTIPART_OVERHEAD
+    assert run_middleware([b'x' * limit]) == 200
+    assert run_middleware([b'x' * (limit // 2), b'x' * (limit // 2 + 1)]) == 413
+    assert run_middleware([b'x' * (limit + 1)], path='/other') == 200